@@ -0,0 +1,129 @@
+"""Admission checks that run before any socket handler touches a game.
+
+Schemas are compiled once into a flat tuple of checks, so validating a
+payload costs a few type tests. Rate limits are token buckets keyed by
+connection sid or client IP. ``GameQuota`` caps how many live games one
+connection can create.
+"""
+
+import re
+
+from engine import COLS
+
+_MISSING = object()
+_ID = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+
+def text(max_length):
+    return lambda value: isinstance(value, str) and len(value) <= max_length
+
+
+def identifier(max_length=64):
+    """Letters, digits, ``-`` and ``_``, as used for game and player ids"""
+    return lambda value: isinstance(value, str) and len(value) <= max_length and _ID.fullmatch(value) is not None
+
+
+def integer(low, high):
+    # bool is an int subclass; True is not a column
+    return lambda value: type(value) is int and low <= value <= high
+
+
+def number(low, high):
+    return lambda value: type(value) in (int, float) and low <= value <= high
+
+
+def boolean(value):
+    return type(value) is bool
+
+
+def one_of(options):
+    options = frozenset(options)
+    return lambda value: isinstance(value, str) and value in options
+
+
+def compile_schema(required=None, optional=None):
+    """Validator for a payload dict; returns an error message or ``None``.
+
+    Keys not listed are ignored. An optional key may be missing or ``None``.
+    """
+    checks = tuple(
+        [(name, check, True) for name, check in (required or {}).items()]
+        + [(name, check, False) for name, check in (optional or {}).items()]
+    )
+
+    def validate(data):
+        if not isinstance(data, dict):
+            return 'Expected an object'
+        for name, check, needed in checks:
+            value = data.get(name, _MISSING)
+            if value is _MISSING or value is None:
+                if needed:
+                    return f'Missing {name}'
+            elif not check(value):
+                return f'Invalid {name}'
+        return None
+
+    return validate
+
+
+GAME_ID = identifier(32)
+PLAYER_ID = identifier(64)
+PLAYER_NAME = text(40)
+COLUMN = integer(0, COLS - 1)
+
+
+class RateLimiter:
+    """Token buckets: ``rate`` tokens a second per key, holding up to ``burst``"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        # key -> [tokens, time of last update]
+        self._buckets = {}
+
+    def allow(self, key, now, cost=1):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._buckets[key] = [self.burst - cost, now]
+            return True
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < cost:
+            bucket[0] = tokens
+            return False
+        bucket[0] = tokens - cost
+        return True
+
+    def forget(self, key):
+        self._buckets.pop(key, None)
+
+    def prune(self, now):
+        """Drop buckets that have refilled; they behave the same as new ones"""
+        refill = self.burst / self.rate
+        for key in [key for key, (_, updated) in self._buckets.items() if now - updated >= refill]:
+            del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class GameQuota:
+    """Games created by each connection, capped at ``limit`` that still exist"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._games = {}
+
+    def allow(self, sid, exists):
+        """Whether ``sid`` may create another game; ``exists(game_id)`` checks the store"""
+        games = self._games.get(sid)
+        if not games or len(games) < self.limit:
+            return True
+        games.intersection_update([game_id for game_id in games if exists(game_id)])
+        return len(games) < self.limit
+
+    def add(self, sid, game_id):
+        self._games.setdefault(sid, set()).add(game_id)
+
+    def forget(self, sid):
+        self._games.pop(sid, None)
@@ -0,0 +1,335 @@
+"""Computer opponent: negamax alpha-beta search over bitboards.
+
+Positions use the usual solver encoding: ``position`` holds the discs of the
+side to move and ``mask`` holds every disc on the board. ``position + mask`` is
+unique per position, so it is the transposition table and opening book key.
+
+Search is CPU bound, so the server runs it in a ``SearchPool`` (a process pool
+with a bounded number of pending searches) rather than on the event loop.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+from engine import BOARD_MASK, BOTTOM_MASK, CELLS, COLS, COLUMN_HEIGHT, LINES_THROUGH, ROWS, has_four
+
+# Difficulty presets: maximum depth, time budget per move (seconds), random move chance
+DIFFICULTIES = {
+    'easy': {'depth': 2, 'time': 0.2, 'random': 0.3},
+    'medium': {'depth': 6, 'time': 0.5, 'random': 0.0},
+    'hard': {'depth': 14, 'time': 2.0, 'random': 0.0},
+}
+
+CENTER_FIRST = (3, 2, 4, 1, 5, 0, 6)
+COLUMN_MASKS = tuple(((1 << ROWS) - 1) << (col * COLUMN_HEIGHT) for col in range(COLS))
+ALL_LINES = tuple(sorted({line for lines in LINES_THROUGH.values() for line in lines}))
+
+WIN_SCORE = 1000
+LINE_WEIGHTS = (0, 1, 4, 16, 0)
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.json')
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class TranspositionTable:
+    """Fixed-size table indexed by ``key % size``; deeper entries win collisions"""
+
+    def __init__(self, size=1 << 18):
+        self.size = size
+        self.entries = [None] * size
+        self.probes = 0
+        self.hits = 0
+
+    def get(self, key):
+        self.probes += 1
+        entry = self.entries[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def put(self, key, depth, flag, score, move):
+        slot = key % self.size
+        entry = self.entries[slot]
+        if entry is None or entry[0] == key or entry[1] <= depth:
+            self.entries[slot] = (key, depth, flag, score, move)
+
+
+def load_opening_book(path=BOOK_PATH):
+    try:
+        with open(path) as f:
+            return {int(key): col for key, col in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+
+
+class Searcher:
+    def __init__(self, tt_size=1 << 18, book=None):
+        self.tt = TranspositionTable(tt_size)
+        self.book = book if book is not None else {}
+        self.nodes = 0
+        self.deadline = None
+
+    def evaluate(self, position, mask):
+        """Static score for the side to move: open lines weighted by disc count"""
+        opponent = position ^ mask
+        score = 0
+        for line in ALL_LINES:
+            mine = line & position
+            theirs = line & opponent
+            if mine and not theirs:
+                score += LINE_WEIGHTS[mine.bit_count()]
+            elif theirs and not mine:
+                score -= LINE_WEIGHTS[theirs.bit_count()]
+        return score
+
+    def negamax(self, position, mask, moves, depth, alpha, beta):
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes & 1023 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        if moves == CELLS:
+            return 0
+
+        possible = (mask + BOTTOM_MASK) & BOARD_MASK
+        for col in CENTER_FIRST:
+            move = possible & COLUMN_MASKS[col]
+            if move and has_four(position | move):
+                return WIN_SCORE + (CELLS + 1 - moves) // 2
+
+        if depth == 0:
+            return self.evaluate(position, mask)
+
+        key = position + mask
+        original_alpha = alpha
+        entry = self.tt.get(key)
+        first = None
+        if entry is not None:
+            _, entry_depth, flag, score, first = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return score
+                if flag == LOWER:
+                    alpha = max(alpha, score)
+                elif flag == UPPER:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        order = CENTER_FIRST if first is None else (first,) + tuple(c for c in CENTER_FIRST if c != first)
+        best_score = -WIN_SCORE * 2
+        best_move = None
+        for col in order:
+            move = possible & COLUMN_MASKS[col]
+            if not move:
+                continue
+            score = -self.negamax(position ^ mask, mask | move, moves + 1, depth - 1, -beta, -alpha)
+            if score > best_score:
+                best_score = score
+                best_move = col
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.put(key, depth, flag, best_score, best_move)
+        return best_score
+
+    def search(self, position, mask, moves, max_depth, time_budget=None, use_book=True):
+        """Iterative deepening; returns ``(column, stats)`` for the side to move"""
+        started = time.perf_counter()
+        self.nodes = 0
+        self.deadline = started + time_budget if time_budget else None
+        legal = [col for col in CENTER_FIRST if (mask + BOTTOM_MASK) & BOARD_MASK & COLUMN_MASKS[col]]
+        stats = {'depth': 0, 'book': False}
+
+        booked = self.book.get(position + mask) if use_book else None
+        if booked is not None and booked in legal:
+            stats['book'] = True
+            return booked, self._stats(stats, started)
+
+        best = legal[0]
+        for depth in range(1, max_depth + 1):
+            try:
+                score = -WIN_SCORE * 2
+                alpha, beta = -WIN_SCORE * 2, WIN_SCORE * 2
+                choice = best
+                # Try the previous iteration's best move first
+                for col in [best] + [c for c in legal if c != best]:
+                    move = (mask + BOTTOM_MASK) & BOARD_MASK & COLUMN_MASKS[col]
+                    if has_four(position | move):
+                        score, choice = WIN_SCORE + (CELLS + 1 - moves) // 2, col
+                        break
+                    value = -self.negamax(position ^ mask, mask | move, moves + 1, depth - 1, -beta, -alpha)
+                    if value > score:
+                        score, choice = value, col
+                    alpha = max(alpha, value)
+            except SearchTimeout:
+                break
+            best = choice
+            stats['depth'] = depth
+            stats['score'] = score
+            if abs(score) >= WIN_SCORE or moves + depth >= CELLS:
+                break
+        return best, self._stats(stats, started)
+
+    def _stats(self, stats, started):
+        elapsed = time.perf_counter() - started
+        stats.update({
+            'nodes': self.nodes,
+            'seconds': round(elapsed, 4),
+            'nodesPerSecond': int(self.nodes / elapsed) if elapsed else 0,
+            'ttProbes': self.tt.probes,
+            'ttHits': self.tt.hits,
+        })
+        return stats
+
+
+_searcher = None
+
+
+def choose_move(bitboards, difficulty='medium'):
+    """Pick a column for the side to move; runs inside pool worker processes"""
+    global _searcher
+    if _searcher is None:
+        _searcher = Searcher(book=load_opening_book())
+
+    settings = DIFFICULTIES[difficulty]
+    first, second = bitboards
+    mask = first | second
+    moves = mask.bit_count()
+    position = first if moves % 2 == 0 else second
+
+    if settings['random'] and random.random() < settings['random']:
+        legal = [col for col in range(COLS) if (mask + BOTTOM_MASK) & BOARD_MASK & COLUMN_MASKS[col]]
+        return random.choice(legal), {'depth': 0, 'book': False, 'random': True, 'nodes': 0}
+
+    # The table is kept between moves; its counters are reported per search
+    _searcher.tt.probes = _searcher.tt.hits = 0
+    return _searcher.search(position, mask, moves, settings['depth'], settings['time'],
+                            use_book=difficulty == 'hard')
+
+
+def build_opening_book(plies=2, depth=12):
+    """Search every position up to ``plies`` moves deep and save the answers"""
+    searcher = Searcher(tt_size=1 << 20)
+    book = {}
+    frontier = [(0, 0, 0)]
+    for ply in range(plies + 1):
+        next_frontier = []
+        for position, mask, moves in frontier:
+            col, _ = searcher.search(position, mask, moves, depth)
+            book[str(position + mask)] = col
+            for reply in range(COLS):
+                move = (mask + BOTTOM_MASK) & BOARD_MASK & COLUMN_MASKS[reply]
+                next_frontier.append((position ^ mask, mask | move, moves + 1))
+        frontier = next_frontier
+    with open(BOOK_PATH, 'w') as f:
+        json.dump(book, f, indent=0, sort_keys=True)
+    return book
+
+
+def _exit_with_parent(parent):
+    """Pool worker initializer: exit once the server is gone, even if it crashed"""
+    def watch():
+        # Workers hold both ends of the task queue, so they never see it close
+        while os.getppid() == parent:
+            time.sleep(1)
+        os._exit(0)
+    threading.Thread(target=watch, daemon=True).start()
+
+
+class SearchPool:
+    """Process pool for bot moves with a cap on searches waiting to run"""
+
+    def __init__(self, workers=2, max_pending=16):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.failures = 0
+        self.searches = 0
+        self.nodes = 0
+        self.seconds = 0.0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.book_moves = 0
+        self.last = None
+        self._executor = None
+
+    def submit(self, bitboards, difficulty):
+        """Start a search; returns a future, or ``None`` if the queue is full or the pool broke"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            return None
+        if self._executor is None:
+            # spawn, not fork: a forked gevent hub is not safe to reuse
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=get_context('spawn'),
+                                                 initializer=_exit_with_parent, initargs=(os.getpid(),))
+        self.pending += 1
+        try:
+            future = self._executor.submit(choose_move, list(bitboards), difficulty)
+        except BrokenProcessPool:
+            self.pending -= 1
+            self.reset()
+            return None
+        except Exception:
+            self.pending -= 1
+            raise
+        future.add_done_callback(self._finished)
+        return future
+
+    def reset(self):
+        """Drop a broken pool; the next search starts a fresh one"""
+        self.failures += 1
+        self.close()
+
+    def close(self):
+        """Stop the worker processes, abandoning searches that have not finished"""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _finished(self, future):
+        self.pending -= 1
+        if future.exception() is None:
+            self.record(future.result()[1])
+
+    def record(self, stats):
+        self.searches += 1
+        self.nodes += stats.get('nodes', 0)
+        self.seconds += stats.get('seconds', 0)
+        self.tt_probes += stats.get('ttProbes', 0)
+        self.tt_hits += stats.get('ttHits', 0)
+        self.book_moves += stats.get('book', False)
+        self.last = stats
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'pending': self.pending,
+            'rejected': self.rejected,
+            'failures': self.failures,
+            'searches': self.searches,
+            'bookMoves': self.book_moves,
+            'nodes': self.nodes,
+            'nodesPerSecond': int(self.nodes / self.seconds) if self.seconds else 0,
+            'ttHitRate': round(self.tt_hits / self.tt_probes, 4) if self.tt_probes else 0.0,
+            'lastSearch': self.last,
+        }
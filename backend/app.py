@@ -1,327 +1,962 @@
-from flask import Flask, request
+from flask import Flask, Response, request
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_cors import CORS
+import atexit
+import functools
+import json
+import os
+import secrets
+import signal
+import sys
 import time
 
+from gevent import get_hub
+from werkzeug.middleware.proxy_fix import ProxyFix
 
+from admission import (COLUMN, GAME_ID, PLAYER_ID, PLAYER_NAME, GameQuota, RateLimiter, boolean,
+                       compile_schema, integer, number, one_of, text)
+from ai import DIFFICULTIES, SearchPool, choose_move
+from clock import TimingWheel, charge_turn, new_clock, pause, resume, start_turn, stop, turn_deadline
+from engine import Board
+from journal import Journal, NullJournal
+from lifecycle import GameLifecycle
+from logs import setup_logging
+from matchmaking import LobbyIndex, MatchQueue
+from metrics import Metrics
+from spectators import SpectatorHub
+from store import create_store
+
+
+
+# Set REDIS_URL to share games and room broadcasts between workers and hosts
+REDIS_URL = os.environ.get('REDIS_URL')
+MAX_GAMES = int(os.environ.get('MAX_GAMES', 10000))
+RECONNECT_GRACE = int(os.environ.get('RECONNECT_GRACE', 60))
+FINISHED_GAME_TTL = int(os.environ.get('FINISHED_GAME_TTL', 300))
+IDLE_GAME_TTL = int(os.environ.get('IDLE_GAME_TTL', 1800))
+SWEEP_INTERVAL = 30
+MOVE_TIME_LIMIT = int(os.environ.get('MOVE_TIME_LIMIT', 30))
+GAME_TIME_LIMIT = int(os.environ.get('GAME_TIME_LIMIT', 600))
+AI_WORKERS = int(os.environ.get('AI_WORKERS', 2))
+AI_MAX_PENDING = int(os.environ.get('AI_MAX_PENDING', 16))
+BOT_SAVE_ATTEMPTS = 5
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+# Set JOURNAL_DIR to record moves to disk. Only for a single worker without Redis:
+# a journal numbers and recovers the games held in its own process
+JOURNAL_DIR = os.environ.get('JOURNAL_DIR')
+if JOURNAL_DIR and REDIS_URL:
+    raise RuntimeError('JOURNAL_DIR cannot be used with REDIS_URL: any worker may handle a move, '
+                       'so records would land in the wrong journal')
+JOURNAL_FLUSH_INTERVAL = float(os.environ.get('JOURNAL_FLUSH_INTERVAL', 0.05))
+# Finished games kept replayable from the journal
+JOURNAL_RETAIN_GAMES = int(os.environ.get('JOURNAL_RETAIN_GAMES', 100000))
+SNAPSHOT_INTERVAL = int(os.environ.get('SNAPSHOT_INTERVAL', 60))
+MATCH_TICK = float(os.environ.get('MATCH_TICK', 1.0))
+DEFAULT_RATING = 1200
+SPECTATOR_INTERVAL = float(os.environ.get('SPECTATOR_INTERVAL', 0.25))
+LOBBY_PAGE_SIZE = 20
+# Token buckets: events per second per connection (pings counted apart) and per client IP
+EVENT_RATE = float(os.environ.get('EVENT_RATE', 10))
+EVENT_BURST = int(os.environ.get('EVENT_BURST', 20))
+PING_RATE = float(os.environ.get('PING_RATE', 1))
+PING_BURST = int(os.environ.get('PING_BURST', 5))
+IP_EVENT_RATE = float(os.environ.get('IP_EVENT_RATE', 50))
+IP_EVENT_BURST = int(os.environ.get('IP_EVENT_BURST', 100))
+CONNECT_RATE = float(os.environ.get('CONNECT_RATE', 2))
+CONNECT_BURST = int(os.environ.get('CONNECT_BURST', 10))
+MAX_GAMES_PER_CONNECTION = int(os.environ.get('MAX_GAMES_PER_CONNECTION', 5))
+# Reverse proxies in front of the app; they set X-Forwarded-For. The Procfile
+# defaults it to 1 for Render; without it every client shares the proxy's IP
+# limits. Leave it 0 only when clients connect directly.
+PROXY_HOPS = int(os.environ.get('PROXY_HOPS', 0))
+
+# The listener starts with the server; spawned AI workers import this module too
+log = setup_logging(level=LOG_LEVEL, start=False)
+metrics = Metrics()
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-change-this-in-production'
 CORS(app, resources={r"/*": {"origins": "*"}})
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='gevent')
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='gevent', message_queue=REDIS_URL)
+if PROXY_HOPS:
+    # Outside the Socket.IO middleware, so connections see the real client address
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_HOPS)
 
 # Store game states
-games = {}
+games = create_store(REDIS_URL, max_games=MAX_GAMES)
+lifecycle = GameLifecycle(games, reconnect_grace=RECONNECT_GRACE,
+                          finished_ttl=FINISHED_GAME_TTL, idle_ttl=IDLE_GAME_TTL)
+server_started = False
+background_started = False
+search_pool = SearchPool(workers=AI_WORKERS, max_pending=AI_MAX_PENDING)
+atexit.register(search_pool.close)
+# Turn deadlines for games whose latest move was handled on this worker
+wheel = TimingWheel(tick=0.1, on_error=lambda timer, exc: task_failed('clock_wheel'))
+clock_timers = {}
+# game_id -> seq of the position the computer is searching
+bot_searches = {}
+# Opened by start_server()
+journal = NullJournal()
+# Both are per worker: a player is matched with others queued on the same worker
+matchmaking = MatchQueue()
+lobby = LobbyIndex()
+spectators = SpectatorHub(socketio.server, interval=SPECTATOR_INTERVAL)
+event_limiter = RateLimiter(EVENT_RATE, EVENT_BURST)
+ping_limiter = RateLimiter(PING_RATE, PING_BURST)
+ip_limiter = RateLimiter(IP_EVENT_RATE, IP_EVENT_BURST)
+connect_limiter = RateLimiter(CONNECT_RATE, CONNECT_BURST)
+game_quota = GameQuota(MAX_GAMES_PER_CONNECTION)
+client_ips = {}
+throttled = set()
+
+def socket_event(event, schema=None, limiter=None, cost=1, admit=True):
+    """Register a Socket.IO handler that records its count, latency and errors.
+
+    Unless ``admit`` is False, the event must pass the rate limits and
+    ``schema`` before the handler runs.
+    """
+    if limiter is None:
+        limiter = event_limiter
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(*args):
+            started = time.perf_counter()
+            try:
+                if admit and not admitted(schema, limiter, cost, args):
+                    return None
+                return handler(*args)
+            except Exception as exc:
+                metrics.count_error(type(exc).__name__)
+                log.exception('handler_failed', event=event, sid=request.sid)
+                raise
+            finally:
+                metrics.observe_event(event, time.perf_counter() - started)
+        return socketio.on(event)(wrapper)
+    return decorator
+
+def admitted(schema, limiter, cost, args):
+    """Cheap checks that run before any game lookup: rate limits, then the payload"""
+    sid = request.sid
+    now = time.monotonic()
+    if not (limiter.allow(sid, now, cost) and ip_limiter.allow(client_ips.get(sid), now, cost)):
+        metrics.count_error('rate_limited')
+        # One error per burst; a flooding client is not answered packet by packet
+        if sid not in throttled:
+            throttled.add(sid)
+            emit('error', {'message': 'Too many requests, please slow down'})
+        return False
+    throttled.discard(sid)
+    
+    if schema is not None:
+        error = schema(args[0] if args else None)
+        if error is not None:
+            reject('invalid_request', error)
+            return False
+    return True
+
+def reject(kind, message):
+    """Send an error to the caller and count it by kind"""
+    metrics.count_error(kind)
+    emit('error', {'message': message})
+
+def game_state(game):
+    """Full board snapshot, only sent on join and on sync_state resyncs"""
+    board = game['board']
+    return {
+        'seq': game['seq'],
+        'board': board.to_list(),
+        'currentPlayer': board.current_player,
+        'winner': board.winner,
+        'draw': board.is_draw
+    }
+
+def players_info(game):
+    return {num: {'name': info['name']} for num, info in game['players'].items()}
+
+def spectator_state(game_id, game):
+    """Snapshot sent to spectators; moves in between are coalesced into it"""
+    return {
+        'gameId': game_id,
+        **game_state(game),
+        'lastMove': game['board'].last_move,
+        'players': players_info(game),
+        'remaining': [round(left, 1) for left in game['clock']['remaining']]
+    }
+
+def retire_game(game_id):
+    """Clean up after a game left the store, swept or evicted for MAX_GAMES"""
+    timer = clock_timers.pop(game_id, None)
+    if timer is not None:
+        wheel.cancel(timer)
+    journal.evict(game_id)
+    lobby.remove(game_id)
+    for sid, _ in list(socketio.server.manager.get_participants('/', game_id)):
+        if lifecycle.game_for(sid) == game_id:
+            lifecycle.unbind(sid)
+    log.info('game_evicted', game=game_id)
+    socketio.emit('error', {'message': 'Game expired'}, room=game_id)
+    socketio.close_room(game_id)
+
+def put_game(game_id, game, replace=True):
+    """Store a new game, retiring any game evicted to make room.
+
+    False if ``replace`` is off and the id is already taken.
+    """
+    evicted = games.put(game_id, game, replace=replace)
+    if evicted is None:
+        return False
+    for evicted_id in evicted:
+        retire_game(evicted_id)
+    return True
+
+def task_failed(task):
+    """Log and count an error in a background task; call from an except block"""
+    log.exception('background_task_failed', task=task)
+    metrics.count_error('background_task')
+
+def background_task(interval):
+    """Run the decorated function every ``interval`` seconds; an error skips one round"""
+    def decorator(func):
+        @functools.wraps(func)
+        def loop():
+            while True:
+                socketio.sleep(interval)
+                try:
+                    func()
+                except Exception:
+                    task_failed(func.__name__)
+        return loop
+    return decorator
+
+@background_task(SWEEP_INTERVAL)
+def sweep_games():
+    """Background task: evict finished, abandoned and idle games"""
+    now = time.monotonic()
+    ip_limiter.prune(now)
+    connect_limiter.prune(now)
+    for game_id in lifecycle.sweep():
+        # Already gone from the store; one failed cleanup must not skip the rest
+        try:
+            retire_game(game_id)
+        except Exception:
+            task_failed('sweep_games')
+
+@background_task(JOURNAL_FLUSH_INTERVAL)
+def flush_journal():
+    """Background task: group-commit journal records on a native thread"""
+    chunks = journal.detach()
+    if chunks:
+        get_hub().threadpool.apply(journal.commit, (chunks,))
+
+@background_task(SNAPSHOT_INTERVAL)
+def snapshot_games():
+    """Background task: bound recovery time by snapshotting live games"""
+    live = ((game_id, games.get(game_id, touch=False)) for game_id in games.ids())
+    payload = journal.prepare_snapshot((game_id, game) for game_id, game in live if game is not None)
+    get_hub().threadpool.apply(journal.write_snapshot, (payload,))
+    log.info('snapshot_written', games=len(games))
+
+def recover_games():
+    """Reload the games this worker had before it restarted"""
+    recovered = journal.recover()
+    for game_id, game in recovered.items():
+        game['room_members'] = []
+        game['clock'] = new_clock(GAME_TIME_LIMIT)
+        begin_turn(game)
+        put_game(game_id, game)
+        schedule_bot_move(game_id, game)
+    if recovered:
+        log.info('games_recovered', games=len(recovered))
+
+@background_task(MATCH_TICK)
+def run_matchmaker():
+    """Background task: pair queued players once per MATCH_TICK"""
+    for first_sid, first, second_sid, second in matchmaking.tick(time.time()):
+        # The pair has left the queue; a failure here must not drop the pairs after it
+        try:
+            start_matched_game((first_sid, first), (second_sid, second))
+        except Exception:
+            task_failed('run_matchmaker')
+
+def start_matched_game(*seats):
+    """Create a game for two matched players and seat them in it"""
+    players = {}
+    for number, (sid, ticket) in enumerate(seats, start=1):
+        players[number] = {'id': ticket['id'], 'name': ticket['name'], 'sid': sid, 'away': None}
+    game = {
+        'board': Board(),
+        'seq': 0,
+        'players': players,
+        'room_members': [sid for sid, _ in seats],
+        'clock': new_clock(GAME_TIME_LIMIT)
+    }
+    begin_turn(game)
+    game_id = secrets.token_hex(3).upper()
+    while not put_game(game_id, game, replace=False):
+        game_id = secrets.token_hex(3).upper()
+    journal.start(game_id, game)
+    
+    for number, (sid, _) in enumerate(seats, start=1):
+        lifecycle.bind(sid, game_id, number)
+        socketio.server.enter_room(sid, game_id, namespace='/')
+        socketio.emit('match_found', {
+            'gameId': game_id,
+            'playerNumber': number,
+            'playerName': players[number]['name'],
+            'gameState': game_state(game),
+            'players': players_info(game)
+        }, to=sid)
+    schedule_clock(game_id, game)
+    log.info('match_found', game=game_id, ratings=[ticket['rating'] for _, ticket in seats])
+
+@background_task(SPECTATOR_INTERVAL)
+def feed_spectators():
+    """Background task: send each changed game to its spectators, encoded once"""
+    now = time.time()
+    for game_id, version in spectators.due(now):
+        game = games.get(game_id, touch=False)
+        if game is None:
+            spectators.broadcast(game_id, 'watch_ended', {'gameId': game_id})
+            spectators.close(game_id)
+        elif game['updatedAt'] != version:
+            spectators.broadcast(game_id, 'spectator_update', spectator_state(game_id, game),
+                                 version=game['updatedAt'], now=now)
+
+@background_task(wheel.tick)
+def run_clock_wheel():
+    """Background task: the single driver for every turn deadline"""
+    wheel.advance(time.time())
+
+def begin_turn(game):
+    """Start the clock for the player to move; the computer is not timed"""
+    board = game['board']
+    player = game['players'].get(board.current_player)
+    if board.is_over or len(game['players']) < 2 or player.get('bot'):
+        stop(game['clock'])
+    elif player.get('away') is not None:
+        # Their seat is held for a reconnect; rejoin_game starts the clock
+        stop(game['clock'])
+    else:
+        start_turn(game['clock'], time.time())
+
+def schedule_clock(game_id, game):
+    """Put the current turn's deadline on the wheel and tell the room"""
+    timer = clock_timers.pop(game_id, None)
+    if timer is not None:
+        wheel.cancel(timer)
+    
+    clock = game['clock']
+    if clock['turnStartedAt'] is None:
+        return
+    
+    player = game['board'].current_player
+    deadline = turn_deadline(clock, player, MOVE_TIME_LIMIT)
+    clock_timers[game_id] = wheel.schedule(deadline, expire_turn, game_id, game['seq'])
+    
+    socketio.emit('clock_update', {
+        'seq': game['seq'],
+        'player': player,
+        'moveSeconds': round(deadline - time.time(), 1),
+        'moveLimit': MOVE_TIME_LIMIT,
+        'remaining': [round(left, 1) for left in clock['remaining']]
+    }, room=game_id)
+
+def expire_turn(game_id, seq):
+    clock_timers.pop(game_id, None)
+    game = games.get(game_id)
+    # Stale timer: a move, reset or eviction already happened
+    if game is None or game['seq'] != seq or game['board'].is_over:
+        return
+    
+    loser = game['board'].current_player
+    charge_turn(game['clock'], loser, time.time(), MOVE_TIME_LIMIT)
+    declare_timeout(game_id, game, loser)
+
+def declare_timeout(game_id, game, loser):
+    """End the game as a loss on time for ``loser``"""
+    reason = 'game' if game['clock']['remaining'][loser - 1] <= 0 else 'move'
+    game['board'].winner = 3 - loser
+    stop(game['clock'])
+    game['seq'] += 1
+    
+    if games.save(game_id, game):
+        journal.timeout(game, loser)
+        socketio.emit('timeout_loss', {
+            'seq': game['seq'],
+            'loser': loser,
+            'winner': 3 - loser,
+            'reason': reason
+        }, room=game_id)
+        log.info('timeout_loss', game=game_id, loser=loser, reason=reason)
+
+def broadcast_move(game_id, game, row, col, player_number):
+    """Send only the delta; clients request sync_state if they see a gap"""
+    socketio.emit('move_made', {
+        'seq': game['seq'],
+        'row': row,
+        'col': col,
+        'player': player_number,
+        'winner': game['board'].winner
+    }, room=game_id)
+
+def schedule_bot_move(game_id, game):
+    """Start a search if the computer is the player to move"""
+    board = game['board']
+    player = game['players'].get(board.current_player)
+    if board.is_over or player is None or not player.get('bot'):
+        return
+    # A rejoin reschedules; don't start a second search for the same position
+    if bot_searches.get(game_id) == game['seq']:
+        return
+    bot_searches[game_id] = game['seq']
+    socketio.start_background_task(play_bot_move, game_id, game['seq'], player['bot'], list(board.bitboards))
+
+def search_bot_move(game_id, difficulty, bitboards):
+    """Column and stats from the pool, or from a shallow search here if it can't help"""
+    try:
+        future = search_pool.submit(bitboards, difficulty)
+    except Exception:
+        log.exception('bot_search_failed', game=game_id)
+        metrics.count_error('bot_search_failed')
+        future = None
+    if future is not None:
+        # Poll instead of blocking on result() so the gevent loop keeps running
+        while not future.done():
+            socketio.sleep(0.01)
+        try:
+            return future.result()
+        except Exception:
+            # A worker died (BrokenProcessPool) or the search failed
+            log.exception('bot_search_failed', game=game_id)
+            metrics.count_error('bot_search_failed')
+            search_pool.reset()
+    # Queue full or pool failed: answer with a shallow search rather than stall the game
+    col, stats = choose_move(bitboards, 'easy')
+    search_pool.record(stats)
+    return col, stats
+
+def play_bot_move(game_id, seq, difficulty, bitboards):
+    try:
+        col, stats = search_bot_move(game_id, difficulty, bitboards)
+        for _ in range(BOT_SAVE_ATTEMPTS):
+            game = games.get(game_id)
+            # The game may have been reset, rematched or evicted while we were thinking
+            if game is None or game['seq'] != seq:
+                return
+            
+            player_number = game['board'].current_player
+            row = game['board'].play(col)
+            begin_turn(game)
+            game['seq'] += 1
+            if games.save(game_id, game):
+                break
+            # Another write (a rejoin, a player leaving) won the race; reread and try again
+        else:
+            log.warning('bot_move_conflict', game=game_id)
+            return
+    finally:
+        if bot_searches.get(game_id) == seq:
+            del bot_searches[game_id]
+    
+    journal.move(game, col)
+    broadcast_move(game_id, game, row, col, player_number)
+    schedule_clock(game_id, game)
+    log.debug('bot_move', game=game_id, col=col, depth=stats.get('depth'), nodes=stats.get('nodes'))
+
+def rejoin_game(game_id, game, player_number):
+    """Give a returning player their seat back after a reconnect"""
+    player = game['players'][player_number]
+    player['sid'] = request.sid
+    player['away'] = None
+    game['room_members'].append(request.sid)
+    board = game['board']
+    if player_number == board.current_player and not board.is_over and len(game['players']) == 2:
+        resume(game['clock'], time.time())
+    
+    if not games.save(game_id, game):
+        reject('conflict', 'Game state changed, please retry')
+        return
+    
+    lifecycle.bind(request.sid, game_id, player_number)
+    join_room(game_id)
+    
+    emit('game_joined', {
+        'gameId': game_id,
+        'playerNumber': player_number,
+        'playerName': player['name'],
+        'gameState': game_state(game),
+        'players': players_info(game)
+    })
+    emit('player_returned', {'playerNumber': player_number}, room=game_id, skip_sid=request.sid)
+    schedule_clock(game_id, game)
+    # In case the computer's move was lost, e.g. to a restart
+    schedule_bot_move(game_id, game)
+    log.info('player_rejoined', game=game_id, player=player_number)
 
 @app.route('/')
 def index():
-    return {'status': 'Connect Four Server Running', 'games': len(games), 'active_games': list(games.keys())}
+    # Counters only, so the status page costs the same at any number of games
+    return {
+        'status': 'Connect Four Server Running',
+        'games': len(games),
+        'evicted_games': games.evicted,
+        'open_games': len(lobby),
+        'matchmaking': len(matchmaking),
+        'spectators': len(spectators.watching)
+    }
+
+@app.route('/lobby')
+def list_lobby():
+    """Open games waiting for an opponent, a page at a time"""
+    cursor = request.args.get('cursor', type=int)
+    limit = min(request.args.get('limit', LOBBY_PAGE_SIZE, type=int), 100)
+    open_games, next_cursor = lobby.page(cursor, max(limit, 1))
+    return {'games': open_games, 'nextCursor': next_cursor}
+
+@app.route('/replay/<game_id>')
+def replay(game_id):
+    """Stream a game's recorded events as JSON lines, read from disk"""
+    events = journal.replay(game_id)
+    if events is None:
+        return {'error': f'No recording of game {game_id}'}, 404
+    return Response((json.dumps(event) + '\n' for event in events), mimetype='application/x-ndjson')
+
+@app.route('/ai/stats')
+def ai_stats():
+    return search_pool.stats()
+
+@app.route('/metrics')
+def prometheus_metrics():
+    body = metrics.render(gauges={
+        'active_games': len(games),
+        'ai_pending_searches': search_pool.pending,
+        'clock_timers': wheel.pending,
+        'lobby_open_games': len(lobby),
+        'matchmaking_waiting': len(matchmaking),
+        'spectators': len(spectators.watching)
+    }, counters={
+        'evicted_games': games.evicted,
+        'spectator_packets': spectators.packets,
+        'spectator_deliveries': spectators.deliveries,
+        'spectator_skipped': spectators.skipped,
+        'journal_records': getattr(journal, 'records', 0),
+        'journal_commits': getattr(journal, 'commits', 0)
+    })
+    return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
 
 @app.route('/health')
 def health():
     return {'status': 'healthy'}
 
-@socketio.on('connect')
-def handle_connect():
-    print(f'✅ Client connected: {request.sid}')
+def start_server():
+    """One-time startup: logging, the journal and game recovery.
+
+    Runs from the entry point or the first request, never at import: the AI
+    pool's spawned workers re-import this module, and a second recovery
+    would truncate the live journal segment.
+    """
+    global server_started, journal
+    if server_started:
+        return
+    server_started = True
+    log.start()
+    if not JOURNAL_DIR:
+        return
+    journal = Journal(JOURNAL_DIR, retain_games=JOURNAL_RETAIN_GAMES)
+    atexit.register(journal.close)
+    atexit.register(journal.flush)
+    recover_games()
+
+@app.before_request
+def ensure_started():
+    start_server()
+
+@socket_event('connect', admit=False)
+def handle_connect(auth=None):
+    global background_started
+    if not connect_limiter.allow(request.remote_addr, time.monotonic()):
+        metrics.count_error('connection_refused')
+        return False
+    client_ips[request.sid] = request.remote_addr
+    start_server()
+    
+    if not background_started:
+        background_started = True
+        socketio.start_background_task(sweep_games)
+        socketio.start_background_task(run_clock_wheel)
+        socketio.start_background_task(run_matchmaker)
+        socketio.start_background_task(feed_spectators)
+        if JOURNAL_DIR:
+            socketio.start_background_task(flush_journal)
+            socketio.start_background_task(snapshot_games)
+    metrics.connections += 1
+    log.debug('client_connected', sid=request.sid)
     emit('connected', {'message': 'Connected to server', 'sid': request.sid})
 
-@socketio.on('disconnect')
-def handle_disconnect():
-    print(f'❌ Client disconnected: {request.sid}')
+@socket_event('disconnect', admit=False)
+def handle_disconnect(reason=None):
+    metrics.connections -= 1
+    log.debug('client_disconnected', sid=request.sid)
+    client_ips.pop(request.sid, None)
+    event_limiter.forget(request.sid)
+    ping_limiter.forget(request.sid)
+    throttled.discard(request.sid)
+    game_quota.forget(request.sid)
+    matchmaking.remove(request.sid)
+    spectators.unwatch(request.sid)
+    
+    game_id = lifecycle.game_for(request.sid)
+    game = games.get(game_id) if game_id else None
+    player_number = lifecycle.player_for(request.sid, game_id, game) if game else None
+    lifecycle.unbind(request.sid)
+    if player_number is None:
+        return
+    
+    # Keep the seat for RECONNECT_GRACE seconds; the sweeper evicts it after that
+    now = time.time()
+    game['players'][player_number]['sid'] = None
+    game['players'][player_number]['away'] = now
+    if request.sid in game['room_members']:
+        game['room_members'].remove(request.sid)
+    # Don't let them lose on time while the seat is held
+    if player_number == game['board'].current_player:
+        pause(game['clock'], now)
+    
+    if games.save(game_id, game):
+        emit('player_away', {
+            'playerNumber': player_number,
+            'graceSeconds': RECONNECT_GRACE
+        }, room=game_id)
+        schedule_clock(game_id, game)
 
-@socketio.on('create_game')
+@socket_event('create_game', cost=5, schema=compile_schema(
+    {'gameId': GAME_ID, 'playerId': PLAYER_ID},
+    {'playerName': PLAYER_NAME, 'vsComputer': boolean, 'difficulty': one_of(DIFFICULTIES)}))
 def handle_create_game(data):
     game_id = data['gameId']
     player_id = data['playerId']
-    player_name = data.get('playerName', f'Player {player_id[:6]}')
+    player_name = data.get('playerName') or f'Player {player_id[:6]}'
+    
+    # The client re-sends create_game after a reconnect; hand back the seat
+    existing = games.get(game_id)
+    if existing is not None:
+        if existing['players'][1]['id'] == player_id:
+            rejoin_game(game_id, existing, 1)
+        else:
+            reject('game_exists', 'Game ID already in use. Please create a new game.')
+        return
+    
+    if not game_quota.allow(request.sid, games.__contains__):
+        reject('game_quota', f'Too many games on this connection (max {MAX_GAMES_PER_CONNECTION})')
+        return
     
-    games[game_id] = {
-        'board': [[None for _ in range(7)] for _ in range(6)],
-        'currentPlayer': 1,
-        'players': {1: {'id': player_id, 'name': player_name}},
-        'winner': None,
+    players = {1: {'id': player_id, 'name': player_name, 'sid': request.sid, 'away': None}}
+    
+    if data.get('vsComputer'):
+        difficulty = data.get('difficulty') or 'medium'
+        if difficulty not in DIFFICULTIES:
+            reject('bad_difficulty', f'Unknown difficulty: {difficulty}')
+            return
+        players[2] = {'id': f'bot:{difficulty}', 'name': f'Computer ({difficulty})',
+                      'sid': None, 'away': None, 'bot': difficulty}
+    
+    game = {
+        'board': Board(),
+        'seq': 0,
+        'players': players,
         'room_members': [request.sid],
-        'moveTimer': None,
-        'moveStartTime': None
+        'clock': new_clock(GAME_TIME_LIMIT)
     }
+    begin_turn(game)
+    # Another worker may have created the same id since the check above
+    if not put_game(game_id, game, replace=False):
+        reject('game_exists', 'Game ID already in use. Please create a new game.')
+        return
+    journal.start(game_id, game)
+    game_quota.add(request.sid, game_id)
+    if 2 in players:
+        lobby.remove(game_id)
+    else:
+        lobby.add(game_id, {'host': player_name, 'createdAt': round(time.time())})
     
+    lifecycle.bind(request.sid, game_id, 1)
     join_room(game_id)
     
-    # Send full game state to Player 1
+    # A new game always starts empty, so Player 1 only needs the sequence number
     emit('game_created', {
         'gameId': game_id,
         'playerNumber': 1,
         'playerName': player_name,
-        'gameState': {
-            'board': games[game_id]['board'],
-            'currentPlayer': games[game_id]['currentPlayer'],
-            'winner': games[game_id]['winner']
-        },
-        'players': {1: {'name': player_name}}
+        'seq': 0,
+        'players': {num: {'name': info['name']} for num, info in players.items()}
     })
-    print(f'🎮 Game created: {game_id} by {player_name}')
+    schedule_clock(game_id, game)
+    log.info('game_created', game=game_id, vs_computer=bool(data.get('vsComputer')))
 
-@socketio.on('join_game')
+@socket_event('join_game', schema=compile_schema(
+    {'gameId': GAME_ID, 'playerId': PLAYER_ID}, {'playerName': PLAYER_NAME}))
 def handle_join_game(data):
     game_id = data['gameId']
     player_id = data['playerId']
-    player_name = data.get('playerName', f'Player {player_id[:6]}')
+    player_name = data.get('playerName') or f'Player {player_id[:6]}'
     
-    print(f'🔍 Attempting to join game: {game_id}')
-    print(f'📋 Available games: {list(games.keys())}')
+    game = games.get(game_id)
     
-    if game_id not in games:
-        print(f'❌ Game not found: {game_id}')
-        emit('error', {'message': f'Game {game_id} not found. Please check the Game ID.'})
+    if game is None:
+        reject('game_not_found', f'Game {game_id} not found. Please check the Game ID.')
         return
     
-    if 2 in games[game_id]['players']:
-        print(f'❌ Game full: {game_id}')
-        emit('error', {'message': 'Game is full. Maximum 2 players allowed.'})
+    for number, info in game['players'].items():
+        if info['id'] == player_id:
+            rejoin_game(game_id, game, number)
+            return
+    
+    if 2 in game['players']:
+        reject('game_full', 'Game is full. Maximum 2 players allowed.')
+        return
+    
+    game['players'][2] = {'id': player_id, 'name': player_name, 'sid': request.sid, 'away': None}
+    game['room_members'].append(request.sid)
+    begin_turn(game)
+    
+    # Another worker may have filled the seat since we loaded the game
+    if not games.save(game_id, game):
+        reject('game_full', 'Game is full. Maximum 2 players allowed.')
         return
+    journal.join(game, 2)
+    lobby.remove(game_id)
     
-    games[game_id]['players'][2] = {'id': player_id, 'name': player_name}
-    games[game_id]['room_members'].append(request.sid)
+    lifecycle.bind(request.sid, game_id, 2)
     join_room(game_id)
     
-    # Get player names for response
-    players_info = {
-        1: {'name': games[game_id]['players'][1]['name']},
-        2: {'name': player_name}
-    }
+    players = players_info(game)
     
-    # Send game state to the joining player (Player 2)
+    # Send full game state to the joining player (Player 2)
     emit('game_joined', {
         'gameId': game_id,
         'playerNumber': 2,
         'playerName': player_name,
-        'gameState': {
-            'board': games[game_id]['board'],
-            'currentPlayer': games[game_id]['currentPlayer'],
-            'winner': games[game_id]['winner']
-        },
-        'players': players_info
+        'gameState': game_state(game),
+        'players': players
     })
     
-    # Notify Player 1 with full game state to ensure synchronization
+    # Player 1 already holds the board; a sequence gap triggers sync_state
     emit('player_joined', {
         'playerNumber': 2,
         'playerName': player_name,
-        'gameState': {
-            'board': games[game_id]['board'],
-            'currentPlayer': games[game_id]['currentPlayer'],
-            'winner': games[game_id]['winner']
-        },
-        'players': players_info
+        'seq': game['seq'],
+        'players': players
     }, room=game_id, skip_sid=request.sid)
-    print(f'✅ Player 2 ({player_name}) joined game: {game_id}')
+    schedule_clock(game_id, game)
+    log.info('game_joined', game=game_id)
 
-@socketio.on('make_move')
+@socket_event('make_move', schema=compile_schema(
+    {'gameId': GAME_ID, 'col': COLUMN}, {'playerId': text(64)}))
 def handle_move(data):
     game_id = data['gameId']
     col = data['col']
-    player_id = data['playerId']
     
-    print(f'🎯 Move attempt: game={game_id}, col={col}, player={player_id}')
+    game = games.get(game_id)
     
-    if game_id not in games:
-        emit('error', {'message': 'Game not found'})
+    if game is None:
+        reject('game_not_found', 'Game not found')
         return
     
-    game = games[game_id]
-    
     # Check if both players have joined
     if len(game['players']) < 2:
-        print(f'❌ Waiting for second player')
-        emit('error', {'message': 'Waiting for second player to join'})
+        reject('waiting_for_player', 'Waiting for second player to join')
         return
     
     # Verify it's the player's turn
-    player_number = None
-    for num, player_info in game['players'].items():
-        if player_info['id'] == player_id:
-            player_number = num
-            break
+    player_number = lifecycle.player_for(request.sid, game_id, game)
     
     if player_number is None:
-        print(f'❌ Player not in game')
-        emit('error', {'message': 'You are not in this game'})
+        reject('not_in_game', 'You are not in this game')
         return
     
-    if player_number != game['currentPlayer']:
-        print(f'❌ Not player turn. Current: {game["currentPlayer"]}, Attempted: {player_number}')
-        emit('error', {'message': 'Not your turn'})
+    board = game['board']
+    
+    if board.is_over:
+        reject('game_over', 'Game is over')
         return
     
-    # Check if column is full
-    if game['board'][0][col] is not None:
-        emit('error', {'message': 'Column is full'})
+    if player_number != board.current_player:
+        reject('not_your_turn', 'Not your turn')
         return
     
-    # Find the lowest empty row in the column
-    row_played = None
-    for row in range(5, -1, -1):
-        if game['board'][row][col] is None:
-            game['board'][row][col] = game['currentPlayer']
-            row_played = row
-            break
+    if not board.can_play(col):
+        reject('column_full', 'Column is full')
+        return
     
-    if row_played is None:
-        emit('error', {'message': 'Column is full'})
+    # The server clock is authoritative: a late move loses on time
+    if not charge_turn(game['clock'], player_number, time.time(), MOVE_TIME_LIMIT):
+        declare_timeout(game_id, game, player_number)
         return
     
-    print(f'✅ Move made: row={row_played}, col={col}, player={game["currentPlayer"]}')
+    # Drop the disc; the engine only checks lines through the new disc
+    row_played = board.play(col)
     
-    # Check for winner
-    winner = check_winner(game['board'])
-    if winner:
-        game['winner'] = winner
-        print(f'🏆 Winner: Player {winner}')
-    else:
-        game['winner'] = None
-        # Switch player only if no winner
-        game['currentPlayer'] = 2 if game['currentPlayer'] == 1 else 1
-        game['moveStartTime'] = time.time() if 'time' in __builtins__ else None
-    
-    # Get player names
-    players_info = {
-        1: {'name': game['players'][1]['name']},
-        2: {'name': game['players'][2]['name']}
-    }
+    log.debug('move_made', game=game_id, row=row_played, col=col, player=player_number)
+    if board.is_over:
+        log.info('game_over', game=game_id, winner=board.winner, moves=board.moves)
     
-    # Broadcast move to ALL players in the room
-    emit('move_made', {
-        'board': game['board'],
-        'currentPlayer': game['currentPlayer'],
-        'winner': game['winner'],
-        'lastMove': {'row': row_played, 'col': col},
-        'players': players_info
-    }, room=game_id, include_self=True)
+    begin_turn(game)
+    game['seq'] += 1
+    
+    # Compare-and-set: lose the race cleanly if another worker moved first
+    if not games.save(game_id, game):
+        reject('conflict', 'Game state changed, please retry')
+        return
+    journal.move(game, col)
+    
+    broadcast_move(game_id, game, row_played, col, player_number)
+    schedule_clock(game_id, game)
+    schedule_bot_move(game_id, game)
+
+@socket_event('find_match', cost=2, schema=compile_schema(
+    {'playerId': PLAYER_ID}, {'playerName': PLAYER_NAME, 'rating': number(0, 3000)}))
+def handle_find_match(data):
+    rating = data.get('rating') or DEFAULT_RATING
+    player_id = data['playerId']
+    matchmaking.add(request.sid, {
+        'id': player_id,
+        'name': data.get('playerName') or f'Player {player_id[:6]}',
+        'rating': int(rating),
+        'since': time.time()
+    })
+    emit('match_searching', {'waiting': len(matchmaking)})
+    log.debug('match_queued', sid=request.sid, rating=rating)
 
-@socketio.on('reset_game')
+@socket_event('cancel_match')
+def handle_cancel_match(data=None):
+    if matchmaking.remove(request.sid) is not None:
+        emit('match_cancelled', {})
+
+@socket_event('watch_game', schema=compile_schema({'gameId': GAME_ID}))
+def handle_watch_game(data):
+    game_id = data['gameId']
+    
+    game = games.get(game_id, touch=False)
+    
+    if game is None:
+        reject('game_not_found', f'Game {game_id} not found. Please check the Game ID.')
+        return
+    
+    # Spectators get their own room; player events are never sent to it
+    spectators.watch(request.sid, game_id, version=game['updatedAt'], now=time.time())
+    emit('watch_started', spectator_state(game_id, game))
+    log.debug('spectator_joined', game=game_id, audience=spectators.audience.get(game_id))
+
+@socket_event('unwatch_game')
+def handle_unwatch_game(data=None):
+    spectators.unwatch(request.sid)
+
+@socket_event('reset_game', schema=compile_schema({'gameId': GAME_ID}))
 def handle_reset(data):
     game_id = data['gameId']
     
-    print(f'🔄 Resetting game: {game_id}')
+    game = games.get(game_id)
+    
+    if game is None:
+        return
+    
+    if lifecycle.player_for(request.sid, game_id, game) is None:
+        reject('not_in_game', 'You are not in this game')
+        return
+    
+    game['board'].reset()
+    game['clock'] = new_clock(GAME_TIME_LIMIT)
+    begin_turn(game)
+    game['seq'] += 1
     
-    if game_id in games:
-        games[game_id]['board'] = [[None for _ in range(7)] for _ in range(6)]
-        games[game_id]['currentPlayer'] = 1
-        games[game_id]['winner'] = None
-        
-        emit('game_reset', {
-            'board': games[game_id]['board'],
-            'currentPlayer': games[game_id]['currentPlayer'],
-            'winner': games[game_id]['winner']
-        }, room=game_id, include_self=True)
+    if games.save(game_id, game):
+        journal.reset(game)
+        emit('game_reset', {'seq': game['seq']}, room=game_id, include_self=True)
+        schedule_clock(game_id, game)
+        schedule_bot_move(game_id, game)
 
-@socketio.on('request_rematch')
+@socket_event('request_rematch', schema=compile_schema(
+    {'gameId': GAME_ID}, {'switchSides': boolean, 'playerId': text(64)}))
 def handle_rematch_request(data):
     game_id = data['gameId']
-    player_id = data['playerId']
     switch_sides = data.get('switchSides', False)
     
-    if game_id not in games:
-        emit('error', {'message': 'Game not found'})
-        return
+    game = games.get(game_id)
     
-    game = games[game_id]
+    if game is None:
+        reject('game_not_found', 'Game not found')
+        return
     
-    # Find player number
-    player_number = None
-    for num, player_info in game['players'].items():
-        if player_info['id'] == player_id:
-            player_number = num
-            break
+    player_number = lifecycle.player_for(request.sid, game_id, game)
     
     if player_number is None:
-        emit('error', {'message': 'You are not in this game'})
+        reject('not_in_game', 'You are not in this game')
         return
     
-    # Notify other player
-    emit('rematch_requested', {
-        'playerName': game['players'][player_number]['name'],
-        'switchSides': switch_sides
-    }, room=game_id, skip_sid=request.sid)
+    player_name = game['players'][player_number]['name']
     
     # If both players want rematch, reset game
-    if switch_sides:
+    if switch_sides and 2 in game['players']:
         # Switch player numbers
         temp = game['players'][1]
         game['players'][1] = game['players'][2]
         game['players'][2] = temp
     
     # Reset game
-    games[game_id]['board'] = [[None for _ in range(7)] for _ in range(6)]
-    games[game_id]['currentPlayer'] = 1
-    games[game_id]['winner'] = None
-    
-    # Get player names
-    players_info = {
-        1: {'name': game['players'][1]['name']},
-        2: {'name': game['players'][2]['name']}
-    }
+    game['board'].reset()
+    game['clock'] = new_clock(GAME_TIME_LIMIT)
+    begin_turn(game)
+    game['seq'] += 1
+    
+    if not games.save(game_id, game):
+        reject('conflict', 'Game state changed, please retry')
+        return
+    journal.reset(game, switch_sides)
+    
+    # Notify other player
+    emit('rematch_requested', {
+        'playerName': player_name,
+        'switchSides': switch_sides
+    }, room=game_id, skip_sid=request.sid)
     
     # Notify both players
     emit('rematch_accepted', {
         'switchSides': switch_sides,
-        'players': players_info,
-        'gameState': {
-            'board': games[game_id]['board'],
-            'currentPlayer': games[game_id]['currentPlayer'],
-            'winner': games[game_id]['winner']
-        }
+        'players': players_info(game),
+        'seq': game['seq']
     }, room=game_id, include_self=True)
+    schedule_clock(game_id, game)
+    schedule_bot_move(game_id, game)
     
-    print(f'🔄 Rematch accepted for game: {game_id}')
+    log.info('rematch', game=game_id, switch_sides=bool(switch_sides))
+
+@socket_event('sync_state', schema=compile_schema({'gameId': GAME_ID}, {'seq': integer(0, 2 ** 31)}))
+def handle_sync_state(data):
+    game_id = data['gameId']
+    
+    game = games.get(game_id)
+    
+    if game is None:
+        reject('game_not_found', 'Game not found')
+        return
+    
+    log.debug('resync', game=game_id, client_seq=data.get('seq'), seq=game['seq'])
+    
+    emit('sync_state', {
+        **game_state(game),
+        'players': players_info(game)
+    })
 
-@socketio.on('ping')
+@socket_event('ping', limiter=ping_limiter, schema=compile_schema({}, {'timestamp': number(0, 2 ** 53)}))
 def handle_ping(data):
-    emit('pong', {'timestamp': data.get('timestamp')})
-
-def check_winner(board):
-    """Check all possible winning conditions"""
-    
-    # Check horizontal
-    for row in range(6):
-        for col in range(4):  # Only need to check up to column 3
-            if (board[row][col] is not None and
-                board[row][col] == board[row][col + 1] and
-                board[row][col] == board[row][col + 2] and
-                board[row][col] == board[row][col + 3]):
-                return board[row][col]
-    
-    # Check vertical
-    for row in range(3):  # Only need to check up to row 2
-        for col in range(7):
-            if (board[row][col] is not None and
-                board[row][col] == board[row + 1][col] and
-                board[row][col] == board[row + 2][col] and
-                board[row][col] == board[row + 3][col]):
-                return board[row][col]
-    
-    # Check diagonal (down-right)
-    for row in range(3):
-        for col in range(4):
-            if (board[row][col] is not None and
-                board[row][col] == board[row + 1][col + 1] and
-                board[row][col] == board[row + 2][col + 2] and
-                board[row][col] == board[row + 3][col + 3]):
-                return board[row][col]
-    
-    # Check diagonal (down-left)
-    for row in range(3):
-        for col in range(3, 7):
-            if (board[row][col] is not None and
-                board[row][col] == board[row + 1][col - 1] and
-                board[row][col] == board[row + 2][col - 2] and
-                board[row][col] == board[row + 3][col - 3]):
-                return board[row][col]
-    
-    return None
+    # Answered as an event and as the acknowledgement the frontend waits for
+    reply = {'timestamp': data.get('timestamp')}
+    emit('pong', reply)
+    return reply
 
 if __name__ == '__main__':
-    print('🚀 Starting Connect Four Server...')
-    print('📡 Server will be available at http://0.0.0.0:5000')
+    start_server()
+    # Exit through atexit on SIGTERM so the AI pool's workers are not orphaned
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    log.info('server_starting', url='http://0.0.0.0:5000')
     socketio.run(app, host='0.0.0.0', port=5000, debug=True, allow_unsafe_werkzeug=True)
\ No newline at end of file
@@ -0,0 +1,10 @@
+"""Benchmarks for the Connect Four server.
+
+Run from the backend directory:
+
+    python -m bench micro              # engine and serialization microbenchmarks
+    python -m bench load --games 50    # socket load test against a local server
+
+Every command prints a JSON report, so results can be stored and compared
+between releases.
+"""
@@ -0,0 +1,39 @@
+import argparse
+import json
+import sys
+
+from bench import load, micro
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description='Connect Four server benchmarks')
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    micro_parser = commands.add_parser('micro', help='engine and serialization microbenchmarks')
+    micro_parser.add_argument('--repeat', type=int, default=5)
+
+    load_parser = commands.add_parser('load', help='concurrent games over Socket.IO')
+    load_parser.add_argument('--games', type=int, default=20)
+    load_parser.add_argument('--moves', type=int, default=100, help='moves per game, across rematches')
+    load_parser.add_argument('--url', help='benchmark a running server instead of starting one')
+    load_parser.add_argument('--port', type=int, default=5055, help='port for the local server')
+    load_parser.add_argument('--in-process', action='store_true', help='call handlers through test clients')
+
+    args = parser.parse_args(argv)
+    if args.command == 'micro':
+        report = micro.run(repeat=args.repeat)
+    else:
+        report = load.run(games=args.games, moves=args.moves, url=args.url, port=args.port,
+                          in_process=args.in_process)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    return 1 if report.get('errors') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,327 @@
+"""Socket load test: N concurrent games played by python-socketio clients.
+
+Each game runs in its own thread with two clients. They play random legal
+moves, request a rematch when a game ends, and ping periodically. Move
+latency is measured from ``make_move`` to the mover's own ``move_made``.
+
+Modes:
+- default: start the server on localhost in a subprocess (gevent, like prod)
+- ``url``: drive an already running server
+- ``in_process``: call the handlers through Flask-SocketIO test clients,
+  one game at a time, to measure handler cost without the network
+"""
+
+import os
+import queue
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from collections import deque
+
+from engine import COLS, ROWS
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVER_CODE = (
+    'from gevent import monkey; monkey.patch_all()\n'
+    'import app\n'
+    "app.socketio.run(app.app, host='127.0.0.1', port={port}, log_output=False)\n"
+)
+
+# Every benchmark client shares one IP and plays flat out; lift the abuse limits
+UNLIMITED = {
+    'EVENT_RATE': '100000', 'EVENT_BURST': '100000',
+    'PING_RATE': '100000', 'PING_BURST': '100000',
+    'IP_EVENT_RATE': '100000', 'IP_EVENT_BURST': '100000',
+    'CONNECT_RATE': '100000', 'CONNECT_BURST': '100000',
+}
+
+EVENTS = ('game_created', 'game_joined', 'player_joined', 'move_made', 'rematch_accepted', 'pong', 'error')
+
+
+class BenchError(Exception):
+    pass
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def latency_summary(samples):
+    values = sorted(samples)
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        'count': len(values),
+        'p50_ms': to_ms(percentile(values, 0.50)),
+        'p95_ms': to_ms(percentile(values, 0.95)),
+        'p99_ms': to_ms(percentile(values, 0.99)),
+        'max_ms': to_ms(values[-1] if values else None),
+    }
+
+
+class ProcessStats:
+    """RSS and CPU time of a process, read from /proc (Linux only)"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+    def rss_bytes(self):
+        try:
+            with open(f'/proc/{self.pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            return None
+
+    def cpu_seconds(self):
+        try:
+            with open(f'/proc/{self.pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self.ticks
+        except OSError:
+            return None
+
+
+class SocketPlayer:
+    """A python-socketio client that queues the events the benchmark waits on"""
+
+    def __init__(self, url):
+        import socketio
+
+        self.events = queue.Queue()
+        self.client = socketio.Client(reconnection=False)
+        for name in EVENTS:
+            self.client.on(name, self._recorder(name))
+        self.client.connect(url, transports=['websocket'])
+
+    def _recorder(self, name):
+        def record(data=None):
+            self.events.put((name, data, time.perf_counter()))
+        return record
+
+    def emit(self, event, data):
+        self.client.emit(event, data)
+
+    def wait(self, event, predicate=None, timeout=10):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                name, data, received = self.events.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise BenchError(f'timed out waiting for {event}')
+            if name == 'error':
+                raise BenchError(data.get('message'))
+            if name == event and (predicate is None or predicate(data)):
+                return data, received
+
+    def close(self):
+        self.client.disconnect()
+
+
+class InProcessPlayer:
+    """Same interface as SocketPlayer, backed by a Flask-SocketIO test client"""
+
+    def __init__(self, server):
+        self.client = server.socketio.test_client(server.app)
+        self.pending = deque()
+
+    def emit(self, event, data):
+        self.client.emit(event, data)
+
+    def wait(self, event, predicate=None, timeout=None):
+        while True:
+            if not self.pending:
+                received = time.perf_counter()
+                self.pending.extend((packet['name'], packet['args'][0] if packet['args'] else None, received)
+                                    for packet in self.client.get_received())
+                if not self.pending:
+                    raise BenchError(f'no {event} received')
+            name, data, received = self.pending.popleft()
+            if name == 'error':
+                raise BenchError(data.get('message'))
+            if name == event and (predicate is None or predicate(data)):
+                return data, received
+
+    def close(self):
+        self.client.disconnect()
+
+
+def setup_game(make_player, index):
+    game_id = f'BENCH{index}'
+    first, second = make_player(), make_player()
+    first.emit('create_game', {'gameId': game_id, 'playerId': f'bench-{index}-1', 'playerName': 'Bench 1'})
+    first.wait('game_created')
+    second.emit('join_game', {'gameId': game_id, 'playerId': f'bench-{index}-2', 'playerName': 'Bench 2'})
+    second.wait('game_joined')
+    first.wait('player_joined')
+    return game_id, first, second
+
+
+def play_game(game_id, players, moves, seed, result):
+    """Play ``moves`` moves, starting a rematch whenever a game finishes"""
+    rng = random.Random(seed)
+    heights = [0] * COLS
+    seq = 0
+    turn = 0
+    for played in range(moves):
+        mover = players[turn]
+        col = rng.choice([c for c in range(COLS) if heights[c] < ROWS])
+        started = time.perf_counter()
+        mover.emit('make_move', {'gameId': game_id, 'col': col, 'playerId': ''})
+        data, received = mover.wait('move_made', lambda d, target=seq + 1: d['seq'] >= target)
+        result['move_latency'].append(received - started)
+        result['moves'] += 1
+        seq = data['seq']
+        heights[col] += 1
+        turn = 1 - turn
+
+        if data['winner'] or all(height == ROWS for height in heights):
+            started = time.perf_counter()
+            players[0].emit('request_rematch', {'gameId': game_id, 'switchSides': False})
+            data, received = players[0].wait('rematch_accepted')
+            result['rematch_latency'].append(received - started)
+            seq = data['seq']
+            heights = [0] * COLS
+            turn = 0
+
+        if played % 10 == 0:
+            started = time.perf_counter()
+            players[0].emit('ping', {'timestamp': started})
+            _, received = players[0].wait('pong')
+            result['ping_latency'].append(received - started)
+
+
+def new_result():
+    return {'moves': 0, 'move_latency': [], 'rematch_latency': [], 'ping_latency': [], 'errors': []}
+
+
+def start_local_server(port):
+    env = dict(os.environ, LOG_LEVEL='WARNING', **UNLIMITED)
+    process = subprocess.Popen([sys.executable, '-c', SERVER_CODE.format(port=port)], cwd=BACKEND_DIR, env=env)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'{url}/health', timeout=1)
+            return process, url
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise BenchError('local server did not start')
+
+
+def run_threaded(url, games, moves, stats):
+    result = new_result()
+    lock = threading.Lock()
+    ready = threading.Barrier(games + 1)
+    go = threading.Barrier(games + 1)
+
+    def worker(index):
+        local = new_result()
+        players = ()
+        try:
+            game_id, *players = setup_game(lambda: SocketPlayer(url), index)
+            ready.wait()
+            go.wait()
+            play_game(game_id, players, moves, index, local)
+        except (BenchError, threading.BrokenBarrierError) as exc:
+            local['errors'].append(str(exc))
+            ready.abort()
+        finally:
+            for player in players:
+                player.close()
+            with lock:
+                result['moves'] += local['moves']
+                for key in ('move_latency', 'rematch_latency', 'ping_latency', 'errors'):
+                    result[key].extend(local[key])
+
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(games)]
+    baseline_rss = stats.rss_bytes() if stats else None
+    for thread in threads:
+        thread.start()
+    try:
+        ready.wait()
+    except threading.BrokenBarrierError:
+        # A game failed to start; release everyone instead of measuring
+        go.abort()
+    loaded_rss = stats.rss_bytes() if stats else None
+    cpu_start = stats.cpu_seconds() if stats else None
+    started = time.perf_counter()
+    try:
+        go.wait()
+    except threading.BrokenBarrierError:
+        pass
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    cpu_end = stats.cpu_seconds() if stats else None
+    return result, elapsed, baseline_rss, loaded_rss, cpu_start, cpu_end
+
+
+def run_in_process(games, moves):
+    # Keep per-event logs out of the JSON report on stdout
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    for name, value in UNLIMITED.items():
+        os.environ.setdefault(name, value)
+    import app as server
+
+    stats = ProcessStats(os.getpid())
+    result = new_result()
+    baseline_rss = stats.rss_bytes()
+    tables = [setup_game(lambda: InProcessPlayer(server), index) for index in range(games)]
+    loaded_rss = stats.rss_bytes()
+    cpu_start = stats.cpu_seconds()
+    started = time.perf_counter()
+    for index, (game_id, *players) in enumerate(tables):
+        try:
+            play_game(game_id, players, moves, index, result)
+        except BenchError as exc:
+            result['errors'].append(str(exc))
+    elapsed = time.perf_counter() - started
+    return result, elapsed, baseline_rss, loaded_rss, cpu_start, stats.cpu_seconds()
+
+
+def run(games=20, moves=100, url=None, port=5055, in_process=False):
+    process = None
+    if in_process:
+        mode = 'in_process'
+        result, elapsed, baseline_rss, loaded_rss, cpu_start, cpu_end = run_in_process(games, moves)
+    else:
+        mode = 'url' if url else 'local'
+        stats = None
+        if url is None:
+            process, url = start_local_server(port)
+            stats = ProcessStats(process.pid)
+        try:
+            result, elapsed, baseline_rss, loaded_rss, cpu_start, cpu_end = run_threaded(url, games, moves, stats)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=10)
+
+    report = {
+        'benchmark': 'load',
+        'mode': mode,
+        'games': games,
+        'moves_per_game': moves,
+        'moves': result['moves'],
+        'seconds': round(elapsed, 3),
+        'moves_per_second': round(result['moves'] / elapsed, 1) if elapsed else None,
+        'move_latency': latency_summary(result['move_latency']),
+        'rematch_latency': latency_summary(result['rematch_latency']),
+        'ping_latency': latency_summary(result['ping_latency']),
+        'errors': len(result['errors']),
+        'error_samples': result['errors'][:5],
+    }
+    if baseline_rss is not None and loaded_rss is not None and games:
+        report['memory_per_game_bytes'] = round((loaded_rss - baseline_rss) / games)
+    if cpu_start is not None and cpu_end is not None and result['moves']:
+        report['cpu_us_per_move'] = round((cpu_end - cpu_start) / result['moves'] * 1e6, 1)
+    return report
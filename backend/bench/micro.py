@@ -0,0 +1,75 @@
+"""Microbenchmarks for board handling and per-move serialization"""
+
+import json
+import random
+import statistics
+import timeit
+
+from engine import COLS, Board, check_winner
+from store import decode_game, encode_game
+
+
+def random_boards(count, seed=0):
+    """Boards from random games stopped at a random ply, for realistic shapes"""
+    rng = random.Random(seed)
+    boards = []
+    while len(boards) < count:
+        board = Board()
+        stop_at = rng.randint(4, 40)
+        while not board.is_over and board.moves < stop_at:
+            board.play(rng.choice([col for col in range(COLS) if board.can_play(col)]))
+        boards.append(board)
+    return boards
+
+
+def play_random_game(rng):
+    board = Board()
+    while not board.is_over:
+        board.play(rng.choice([col for col in range(COLS) if board.can_play(col)]))
+    return board.moves
+
+
+def measure(func, repeat=5):
+    """Median and best nanoseconds per call of ``func``"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    runs = [elapsed / number * 1e9 for elapsed in timer.repeat(repeat=repeat, number=number)]
+    return {'ns_median': round(statistics.median(runs), 1), 'ns_best': round(min(runs), 1), 'calls': number}
+
+
+def run(repeat=5):
+    boards = random_boards(256)
+    lists = [board.to_list() for board in boards]
+    game = {
+        'board': boards[-1],
+        'seq': boards[-1].moves,
+        'players': {1: {'id': 'a' * 13, 'name': 'Player 1', 'sid': 's' * 20, 'away': None},
+                    2: {'id': 'b' * 13, 'name': 'Player 2', 'sid': 't' * 20, 'away': None}},
+        'room_members': ['s' * 20, 't' * 20],
+        'clock': {'remaining': [600, 600], 'turnStartedAt': 0.0},
+        'rev': 0,
+    }
+    encoded = encode_game(game)
+    rng = random.Random(1)
+    cursor = {'i': 0}
+
+    def next_index():
+        cursor['i'] = (cursor['i'] + 1) % len(boards)
+        return cursor['i']
+
+    results = {
+        'check_winner_list': measure(lambda: check_winner(lists[next_index()]), repeat),
+        'board_to_list': measure(lambda: boards[next_index()].to_list(), repeat),
+        'random_game_play': measure(lambda: play_random_game(rng), repeat),
+        'move_payload_json': measure(lambda: json.dumps(
+            {'seq': 17, 'row': 3, 'col': 4, 'player': 1, 'winner': None}), repeat),
+        'snapshot_json': measure(lambda: json.dumps({
+            'seq': 17, 'board': boards[next_index()].to_list(), 'currentPlayer': 1,
+            'winner': None, 'draw': False}), repeat),
+        'store_encode': measure(lambda: encode_game(game), repeat),
+        'store_decode': measure(lambda: decode_game(encoded), repeat),
+    }
+    moves_per_game = statistics.mean(play_random_game(random.Random(seed)) for seed in range(200))
+    results['random_game_play']['moves_per_game'] = round(moves_per_game, 2)
+    results['store_encode']['bytes'] = len(encoded)
+    return {'benchmark': 'micro', 'results': results}
@@ -0,0 +1,126 @@
+"""Server-side move clocks.
+
+Every game has a clock dict with each player's remaining time bank and the
+start time of the current turn. A turn ends at whichever comes first: the
+per-move limit or the mover's bank running out.
+
+Turn deadlines go on one ``TimingWheel`` per worker, driven by a single
+greenlet. The cost is one timer entry per running game, with no sleeping
+greenlet per game.
+"""
+
+import time
+
+
+def new_clock(game_limit):
+    return {'remaining': [game_limit, game_limit], 'turnStartedAt': None}
+
+
+def start_turn(clock, now):
+    clock['turnStartedAt'] = now
+    clock.pop('spent', None)
+
+
+def stop(clock):
+    clock['turnStartedAt'] = None
+    clock.pop('spent', None)
+
+
+def pause(clock, now):
+    """Hold the running turn, e.g. while the mover is disconnected"""
+    if clock['turnStartedAt'] is not None:
+        clock['spent'] = clock.get('spent', 0.0) + now - clock['turnStartedAt']
+        clock['turnStartedAt'] = None
+
+
+def resume(clock, now):
+    """Restart a held turn with the time already spent on it"""
+    clock['turnStartedAt'] = now - clock.pop('spent', 0.0)
+
+
+def charge_turn(clock, player, now, move_limit):
+    """Deduct the turn just played from ``player``'s bank.
+
+    Returns False if the move came in after the deadline.
+    """
+    if clock['turnStartedAt'] is None:
+        return True
+    elapsed = now - clock['turnStartedAt']
+    clock['remaining'][player - 1] = max(0.0, clock['remaining'][player - 1] - elapsed)
+    clock['turnStartedAt'] = None
+    return elapsed <= move_limit and clock['remaining'][player - 1] > 0
+
+
+def turn_deadline(clock, player, move_limit):
+    return clock['turnStartedAt'] + min(move_limit, clock['remaining'][player - 1])
+
+
+class Timer:
+    __slots__ = ('tick', 'callback', 'args', 'cancelled')
+
+    def __init__(self, tick, callback, args):
+        self.tick = tick
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+
+class TimingWheel:
+    """Hashed timing wheel with O(1) schedule and cancel.
+
+    Timers are hashed into ``slots`` buckets by their expiry tick. Each
+    ``advance`` visits only the buckets for the ticks that have passed, and
+    fires the timers in them that are due. Timers more than one revolution
+    away stay in the bucket until a later pass.
+
+    A callback that raises does not stop the others due on the same pass:
+    ``on_error(timer, exc)`` is called from inside the ``except`` block.
+    Without ``on_error`` the exception propagates.
+    """
+
+    def __init__(self, tick=0.1, slots=512, now=None, on_error=None):
+        self.tick = tick
+        self.slots = [set() for _ in range(slots)]
+        self.current = int((now if now is not None else time.time()) / tick)
+        self.pending = 0
+        self.on_error = on_error
+
+    def schedule(self, deadline, callback, *args):
+        """Call ``callback(*args)`` once the wheel advances past ``deadline``"""
+        tick = max(int(deadline / self.tick) + 1, self.current + 1)
+        timer = Timer(tick, callback, args)
+        self.slots[tick % len(self.slots)].add(timer)
+        self.pending += 1
+        return timer
+
+    def cancel(self, timer):
+        if timer.cancelled:
+            return
+        timer.cancelled = True
+        bucket = self.slots[timer.tick % len(self.slots)]
+        if timer in bucket:
+            bucket.remove(timer)
+            self.pending -= 1
+
+    def advance(self, now):
+        """Fire every timer due by ``now`` and return how many fired"""
+        target = int(now / self.tick)
+        fired = 0
+        # Never walk more than one full revolution; older buckets are the same buckets
+        start = max(self.current + 1, target - len(self.slots) + 1)
+        for tick in range(start, target + 1):
+            bucket = self.slots[tick % len(self.slots)]
+            due = [timer for timer in bucket if timer.tick <= target]
+            for timer in due:
+                bucket.remove(timer)
+                self.pending -= 1
+                timer.cancelled = True
+                fired += 1
+                try:
+                    timer.callback(*timer.args)
+                except Exception as exc:
+                    if self.on_error is None:
+                        raise
+                    self.on_error(timer, exc)
+        self.current = max(self.current, target)
+        return fired
@@ -0,0 +1,170 @@
+"""Bitboard Connect Four engine.
+
+Each board is stored as two integers (one bitboard per player) plus a height
+counter per column. Column ``c`` uses bits ``c * 7`` to ``c * 7 + 5`` from the
+bottom row up; bit ``c * 7 + 6`` is a sentinel that is never set, so shifting
+a line never wraps from one column into the next.
+"""
+
+ROWS = 6
+COLS = 7
+COLUMN_HEIGHT = ROWS + 1
+CELLS = ROWS * COLS
+
+# Bit offsets between neighbouring cells: vertical, horizontal and the two diagonals
+DIRECTIONS = (1, COLUMN_HEIGHT, COLUMN_HEIGHT + 1, COLUMN_HEIGHT - 1)
+_STEPS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+BOTTOM_MASK = sum(1 << (col * COLUMN_HEIGHT) for col in range(COLS))
+BOARD_MASK = BOTTOM_MASK * ((1 << ROWS) - 1)
+
+
+def cell_bit(col, height):
+    """Bit index of the cell at ``col``, ``height`` rows above the bottom"""
+    return col * COLUMN_HEIGHT + height
+
+
+def _build_lines():
+    """Precompute, for every cell, the masks of all four-in-a-rows through it"""
+    lines = {}
+    for col in range(COLS):
+        for height in range(ROWS):
+            masks = []
+            for dc, dh in _STEPS:
+                for back in range(4):
+                    start_col = col - back * dc
+                    start_height = height - back * dh
+                    end_col = start_col + 3 * dc
+                    end_height = start_height + 3 * dh
+                    if not (0 <= start_col < COLS and 0 <= end_col < COLS):
+                        continue
+                    if not (0 <= start_height < ROWS and 0 <= end_height < ROWS):
+                        continue
+                    bit = cell_bit(start_col, start_height)
+                    step = dc * COLUMN_HEIGHT + dh
+                    masks.append(sum(1 << (bit + i * step) for i in range(4)))
+            lines[cell_bit(col, height)] = tuple(masks)
+    return lines
+
+
+LINES_THROUGH = _build_lines()
+
+
+def has_four(bitboard):
+    """Shift-and-mask test for any four-in-a-row anywhere on a bitboard"""
+    for shift in DIRECTIONS:
+        pairs = bitboard & (bitboard >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
+
+
+class Board:
+    """A single game board; player 1 always moves first"""
+
+    __slots__ = ('bitboards', 'heights', 'moves', 'winner', 'last_move')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.bitboards = [0, 0]
+        self.heights = [0] * COLS
+        self.moves = 0
+        self.winner = None
+        self.last_move = None
+
+    @property
+    def current_player(self):
+        return 1 + (self.moves & 1)
+
+    @property
+    def is_draw(self):
+        return self.winner is None and self.moves == CELLS
+
+    @property
+    def is_over(self):
+        return self.winner is not None or self.moves == CELLS
+
+    def can_play(self, col):
+        return 0 <= col < COLS and self.heights[col] < ROWS
+
+    def play(self, col):
+        """Drop a disc for the current player and return the row it landed in.
+
+        Rows are numbered from the top, matching the list-of-lists board sent
+        to clients. Raises ``ValueError`` if the column is full or out of range.
+        """
+        if not self.can_play(col):
+            raise ValueError('Column is full')
+
+        player = self.current_player
+        height = self.heights[col]
+        bit = cell_bit(col, height)
+        bitboard = self.bitboards[player - 1] | (1 << bit)
+        self.bitboards[player - 1] = bitboard
+        self.heights[col] = height + 1
+        self.moves += 1
+
+        # Only lines through the new disc can have been completed by this move
+        for line in LINES_THROUGH[bit]:
+            if bitboard & line == line:
+                self.winner = player
+                break
+
+        row = ROWS - 1 - height
+        self.last_move = (row, col)
+        return row
+
+    def to_dict(self):
+        """Compact JSON-safe form used by the external game store"""
+        return {
+            'bitboards': list(self.bitboards),
+            'heights': list(self.heights),
+            'moves': self.moves,
+            'winner': self.winner,
+            'lastMove': list(self.last_move) if self.last_move else None
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        board = cls.__new__(cls)
+        board.bitboards = list(data['bitboards'])
+        board.heights = list(data['heights'])
+        board.moves = data['moves']
+        board.winner = data['winner']
+        board.last_move = tuple(data['lastMove']) if data['lastMove'] else None
+        return board
+
+    def to_list(self):
+        """Render the board as rows (top first) of ``None``/1/2 for clients"""
+        first, second = self.bitboards
+        board = []
+        for row in range(ROWS):
+            height = ROWS - 1 - row
+            cells = []
+            for col in range(COLS):
+                bit = 1 << cell_bit(col, height)
+                if first & bit:
+                    cells.append(1)
+                elif second & bit:
+                    cells.append(2)
+                else:
+                    cells.append(None)
+            board.append(cells)
+        return board
+
+
+def check_winner(board):
+    """Return the winning player on a list-of-lists board, or ``None``"""
+    bitboards = [0, 0]
+    for row in range(ROWS):
+        height = ROWS - 1 - row
+        for col in range(COLS):
+            player = board[row][col]
+            if player is not None:
+                bitboards[player - 1] |= 1 << cell_bit(col, height)
+    for player in (1, 2):
+        if has_four(bitboards[player - 1]):
+            return player
+    return None
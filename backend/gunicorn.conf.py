@@ -0,0 +1,17 @@
+"""Gunicorn settings. Worker options stay on the Procfile command line."""
+
+import os
+import sys
+
+
+def on_starting(server):
+    # MemoryStore games live in one process; a second worker would not see them
+    if server.cfg.workers > 1 and not os.environ.get('REDIS_URL'):
+        server.log.error('Refusing to start %d workers without REDIS_URL: '
+                         'each worker would keep its own games', server.cfg.workers)
+        sys.exit(1)
+    # Workers would share JOURNAL_DIR, appending to the same segments and snapshot
+    if server.cfg.workers > 1 and os.environ.get('JOURNAL_DIR'):
+        server.log.error('Refusing to start %d workers with JOURNAL_DIR: '
+                         'journaling needs a single worker', server.cfg.workers)
+        sys.exit(1)
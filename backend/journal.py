@@ -0,0 +1,423 @@
+"""Append-only binary journal of game events with snapshot-based recovery.
+
+Every record starts with a 1-byte type and the game's 4-byte journal index.
+A move then needs only one more byte (the column), so it is 6 bytes on disk.
+Records are buffered in memory and written in batches (group commit). The
+server calls ``detach()`` on the event loop and ``commit()`` on a worker
+thread, so ``fsync`` never runs in a socket handler.
+
+Records go into numbered segment files, and a new segment starts once one
+grows past ``segment_bytes``. A snapshot stores every live game plus the
+journal position it covers. Only a consistent copy is taken on the event
+loop, and only of games that changed since the last snapshot; the JSON is
+built and written on a worker thread. Recovery loads the latest snapshot and replays
+the records after that position. Replays of finished games are read straight
+from memory-mapped segments. Only the ``retain_games`` most recently finished
+games stay replayable, so the directory (and each snapshot) stays bounded.
+"""
+
+import json
+import mmap
+import os
+import struct
+import time
+from collections import OrderedDict
+
+from engine import Board
+from store import decode_game
+
+MOVE, START, JOIN, RESET, TIMEOUT, EVICT = 1, 2, 3, 4, 5, 6
+
+HEADER = struct.Struct('<BI')
+BYTE_RECORD = struct.Struct('<BIB')
+PAYLOAD_RECORD = struct.Struct('<BIH')
+
+SEGMENT_PATTERN = 'journal-{:06d}.log'
+SNAPSHOT_FILE = 'snapshot.json'
+
+
+class Journal:
+    def __init__(self, directory, segment_bytes=16 * 1024 * 1024, retain_games=100_000):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.retain_games = retain_games
+        os.makedirs(directory, exist_ok=True)
+        segments = self._segments()
+        self.segment = segments[-1] if segments else 1
+        self.offset = self._committed_size(self.segment)
+        self.next_index = 0
+        # game_id -> (index, segment, offset) of its START record, for replays;
+        # finished games also have the segment of their EVICT record
+        self.games = {}
+        # Finished games still in ``games``, oldest first, each with its
+        # directory entry already encoded: they never change again
+        self._finished = OrderedDict()
+        # game_id -> (updatedAt, JSON) from the last snapshot
+        self._encoded = {}
+        self._indexes = {}
+        self._chunks = []
+        self._fd = None
+        self._fd_segment = None
+        self.records = 0
+        self.commits = 0
+
+    # Writing
+
+    def _path(self, segment):
+        return os.path.join(self.directory, SEGMENT_PATTERN.format(segment))
+
+    def _segments(self):
+        names = [name for name in os.listdir(self.directory) if name.startswith('journal-')]
+        return sorted(int(name[8:14]) for name in names)
+
+    def _committed_size(self, segment):
+        try:
+            return os.path.getsize(self._path(segment))
+        except OSError:
+            return 0
+
+    def _append(self, record):
+        if self.offset and self.offset + len(record) > self.segment_bytes:
+            self.segment += 1
+            self.offset = 0
+        if self._chunks and self._chunks[-1][0] == self.segment:
+            self._chunks[-1][1].extend(record)
+        else:
+            self._chunks.append((self.segment, bytearray(record)))
+        position = (self.segment, self.offset)
+        self.offset += len(record)
+        self.records += 1
+        return position
+
+    def _payload(self, kind, index, data):
+        body = json.dumps(data, separators=(',', ':')).encode()
+        return self._append(PAYLOAD_RECORD.pack(kind, index, len(body)) + body)
+
+    def start(self, game_id, game):
+        index = self.next_index
+        self.next_index += 1
+        game['journal'] = index
+        self._indexes[index] = game_id
+        players = {}
+        for num, info in game['players'].items():
+            players[num] = {'id': info['id'], 'name': info['name']}
+            if info.get('bot'):
+                players[num]['bot'] = info['bot']
+        segment, offset = self._payload(START, index, {'gameId': game_id, 'players': players})
+        self.games[game_id] = (index, segment, offset)
+        self._finished.pop(game_id, None)
+
+    def join(self, game, number):
+        if 'journal' in game:
+            info = game['players'][number]
+            self._payload(JOIN, game['journal'], {'number': number, 'id': info['id'], 'name': info['name']})
+
+    def _byte_record(self, kind, game, value):
+        # Games created before journaling was enabled have no index
+        if 'journal' in game:
+            self._append(BYTE_RECORD.pack(kind, game['journal'], value))
+
+    def move(self, game, col):
+        self._byte_record(MOVE, game, col)
+
+    def reset(self, game, switch_sides=False):
+        self._byte_record(RESET, game, int(bool(switch_sides)))
+
+    def timeout(self, game, loser):
+        self._byte_record(TIMEOUT, game, loser)
+
+    def evict(self, game_id):
+        entry = self.games.get(game_id)
+        if entry is not None and self._indexes.pop(entry[0], None) is not None:
+            segment, _ = self._append(HEADER.pack(EVICT, entry[0]))
+            self._retire(game_id, entry, segment)
+
+    def _retire(self, game_id, entry, segment):
+        """Mark a game finished, forgetting the oldest beyond ``retain_games``"""
+        self.games[game_id] = tuple(entry[:3]) + (segment,)
+        self._finished.pop(game_id, None)
+        self._finished[game_id] = _member(game_id, self.games[game_id])
+        while len(self._finished) > self.retain_games:
+            oldest, _ = self._finished.popitem(last=False)
+            del self.games[oldest]
+
+    def detach(self):
+        """Take the buffered records; pass the result to ``commit``"""
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+    def commit(self, chunks):
+        """Write and fsync a batch; blocking, so run it off the event loop"""
+        for segment, data in chunks:
+            if self._fd_segment != segment:
+                self.close()
+                self._fd = os.open(self._path(segment), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                self._fd_segment = segment
+            os.write(self._fd, data)
+            os.fsync(self._fd)
+        if chunks:
+            self.commits += 1
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = self._fd_segment = None
+
+    def flush(self):
+        self.commit(self.detach())
+
+    # Snapshots and recovery
+
+    def prepare_snapshot(self, games):
+        """Copy ``(game_id, game)`` pairs and the journal position they cover.
+
+        Runs on the event loop, so it only copies games changed since the
+        last snapshot; ``write_snapshot`` does the encoding.
+        """
+        entries = []
+        for game_id, game in games:
+            version = game.get('updatedAt')
+            cached = self._encoded.get(game_id)
+            if cached is not None and cached[0] == version:
+                entries.append((game_id, version, cached[1]))
+            else:
+                frozen = {key: _copy_state(value) for key, value in game.items() if key != 'board'}
+                frozen['board'] = game['board'].to_dict()
+                entries.append((game_id, version, frozen))
+        return {
+            'position': [self.segment, self.offset],
+            'nextIndex': self.next_index,
+            'live': [(game_id, entry) for game_id, entry in self.games.items() if game_id not in self._finished],
+            'finished': list(self._finished.values()),
+            'games': entries,
+            'takenAt': time.time(),
+        }
+
+    def write_snapshot(self, snapshot):
+        """Encode and atomically replace the snapshot; blocking, like ``commit``"""
+        encoded = {}
+        games = []
+        for game_id, version, game in snapshot['games']:
+            if not isinstance(game, str):
+                game = json.dumps(game, separators=(',', ':'))
+            encoded[game_id] = (version, game)
+            games.append(f'{json.dumps(game_id)}:{game}')
+        # Live entries first, then finished ones oldest first; recovery keeps the order
+        directory = [_member(game_id, entry) for game_id, entry in snapshot['live']] + snapshot['finished']
+        header = {key: snapshot[key] for key in ('position', 'nextIndex', 'takenAt')}
+
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        with open(path + '.tmp', 'w') as f:
+            f.write(json.dumps(header, separators=(',', ':'))[:-1])
+            f.write(',"directory":{')
+            f.write(','.join(directory))
+            f.write('},"games":{')
+            f.write(','.join(games))
+            f.write('}}')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        self._encoded = encoded
+
+    def recover(self):
+        """Rebuild live games from the snapshot plus the journal tail.
+
+        Returns ``{game_id: game}``; games have no connected players.
+        """
+        games = {}
+        segment, offset = 1, 0
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            segment, offset = data['position']
+            self.next_index = data['nextIndex']
+            # Snapshots list finished games oldest first, after the live ones
+            self.games = {game_id: tuple(entry) for game_id, entry in data['directory'].items()}
+            self._finished = OrderedDict(
+                (game_id, _member(game_id, entry)) for game_id, entry in self.games.items() if len(entry) > 3)
+            for game_id, payload in data['games'].items():
+                game = decode_game(payload)
+                games[game_id] = game
+                self._indexes[game['journal']] = game_id
+
+        for kind, index, value, position in self._read(segment, offset, truncate=True):
+            if kind == START:
+                game_id = value['gameId']
+                self.games[game_id] = (index, *position)
+                self._finished.pop(game_id, None)
+                players = {int(num): dict(info, sid=None, away=None) for num, info in value['players'].items()}
+                games[game_id] = {'board': Board(), 'seq': 0, 'players': players, 'journal': index}
+                self._indexes[index] = game_id
+                self.next_index = max(self.next_index, index + 1)
+                continue
+
+            game_id = self._indexes.get(index)
+            game = games.get(game_id)
+            # Skip records of an older game that used the same id
+            if game is None or game['journal'] != index:
+                continue
+            if kind == MOVE:
+                game['board'].play(value)
+                game['seq'] += 1
+            elif kind == JOIN:
+                game['players'][value['number']] = {'id': value['id'], 'name': value['name'], 'sid': None, 'away': None}
+            elif kind == RESET:
+                if value and 2 in game['players']:
+                    game['players'][1], game['players'][2] = game['players'][2], game['players'][1]
+                game['board'].reset()
+                game['seq'] += 1
+            elif kind == TIMEOUT:
+                game['board'].winner = 3 - value
+                game['seq'] += 1
+            elif kind == EVICT:
+                games.pop(game_id, None)
+                self._indexes.pop(index, None)
+                self._retire(game_id, self.games[game_id], position[0])
+
+        if (segment, offset) > (self.segment, self.offset):
+            # The snapshot covers records that never reached disk; append past it
+            self.segment, self.offset = segment + 1, 0
+
+        now = time.time()
+        for game in games.values():
+            for info in game['players'].values():
+                info['sid'] = None
+                if not info.get('bot'):
+                    info['away'] = now
+        return games
+
+    # Reading
+
+    def _read(self, segment, offset, truncate=False, last=None):
+        """Yield ``(type, index, value, (segment, offset))`` from a position on,
+        up to the end of segment ``last`` if given"""
+        for number in [n for n in self._segments() if segment <= n <= (last or n)]:
+            start = offset if number == segment else 0
+            path = self._path(number)
+            size = os.path.getsize(path)
+            if size <= start:
+                continue
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                position = start
+                while position < size:
+                    record = self._parse(view, position, size)
+                    if record is None:
+                        break
+                    kind, index, value, length = record
+                    yield kind, index, value, (number, position)
+                    position += length
+            if position < size and truncate:
+                # Torn write from a crash mid-batch: drop the partial record
+                os.truncate(path, position)
+                if number == self.segment:
+                    self.offset = position
+
+    @staticmethod
+    def _parse(view, position, size):
+        if position + HEADER.size > size:
+            return None
+        kind, index = HEADER.unpack_from(view, position)
+        if kind in (MOVE, RESET, TIMEOUT):
+            if position + BYTE_RECORD.size > size:
+                return None
+            return kind, index, BYTE_RECORD.unpack_from(view, position)[2], BYTE_RECORD.size
+        if kind in (START, JOIN):
+            if position + PAYLOAD_RECORD.size > size:
+                return None
+            length = PAYLOAD_RECORD.unpack_from(view, position)[2]
+            end = position + PAYLOAD_RECORD.size + length
+            if end > size:
+                return None
+            return kind, index, json.loads(view[position + PAYLOAD_RECORD.size:end]), end - position
+        if kind == EVICT:
+            return kind, index, None, HEADER.size
+        return None
+
+    def replay(self, game_id):
+        """Stream a game's events from disk; ``None`` if the game is unknown"""
+        entry = self.games.get(game_id)
+        if entry is None:
+            return None
+        index, segment, offset, *last = entry
+        return self._replay(index, segment, offset, last[0] if last else None)
+
+    def _replay(self, game_index, segment, offset, last=None):
+        for kind, index, value, _ in self._read(segment, offset, last=last):
+            if index != game_index:
+                continue
+            if kind == START:
+                # Player ids let a client take a seat back, so they stay private
+                players = {num: {key: info[key] for key in ('name', 'bot') if key in info}
+                           for num, info in value['players'].items()}
+                yield {'type': 'start', 'players': players}
+            elif kind == JOIN:
+                yield {'type': 'join', 'player': value['number'], 'name': value['name']}
+            elif kind == MOVE:
+                yield {'type': 'move', 'col': value}
+            elif kind == RESET:
+                yield {'type': 'reset', 'switchSides': bool(value)}
+            elif kind == TIMEOUT:
+                yield {'type': 'timeout', 'loser': value}
+            elif kind == EVICT:
+                return
+
+
+def _copy_state(value):
+    """Copy of JSON-shaped game state; much cheaper than ``copy.deepcopy``"""
+    if isinstance(value, dict):
+        return {key: _copy_state(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_state(item) for item in value]
+    return value
+
+
+def _member(game_id, entry):
+    """``"game_id":[...]``, one member of the snapshot's directory object"""
+    return f'{json.dumps(game_id)}:{json.dumps(list(entry), separators=(",", ":"))}'
+
+
+class NullJournal:
+    """Stand-in used when JOURNAL_DIR is not set"""
+
+    def start(self, game_id, game):
+        pass
+
+    def join(self, game, number):
+        pass
+
+    def move(self, game, col):
+        pass
+
+    def reset(self, game, switch_sides=False):
+        pass
+
+    def timeout(self, game, loser):
+        pass
+
+    def evict(self, game_id):
+        pass
+
+    def detach(self):
+        return []
+
+    def commit(self, chunks):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def prepare_snapshot(self, games):
+        return None
+
+    def write_snapshot(self, payload):
+        pass
+
+    def recover(self):
+        return {}
+
+    def replay(self, game_id):
+        return None
@@ -0,0 +1,71 @@
+"""Connection tracking and eviction of finished or abandoned games.
+
+Each worker keeps an index of its own socket connections,
+``sid -> (game_id, player_number)``, so handlers find the caller's seat
+without scanning the game's players. The game dict remains the source of
+truth: every player entry records the ``sid`` currently holding that seat.
+"""
+
+import time
+
+
+class GameLifecycle:
+    def __init__(self, store, reconnect_grace=60, finished_ttl=300, idle_ttl=1800):
+        self.store = store
+        self.reconnect_grace = reconnect_grace
+        self.finished_ttl = finished_ttl
+        self.idle_ttl = idle_ttl
+        self.sessions = {}
+
+    def bind(self, sid, game_id, player_number):
+        self.sessions[sid] = (game_id, player_number)
+
+    def unbind(self, sid):
+        return self.sessions.pop(sid, None)
+
+    def game_for(self, sid):
+        entry = self.sessions.get(sid)
+        return entry[0] if entry else None
+
+    def player_for(self, sid, game_id, game):
+        """Seat held by ``sid`` in ``game``, or ``None``; follows side switches"""
+        entry = self.sessions.get(sid)
+        if entry is None or entry[0] != game_id:
+            return None
+        number = entry[1]
+        if game['players'].get(number, {}).get('sid') != sid:
+            # A rematch with switched sides swaps the seats under us
+            number = 3 - number
+            if game['players'].get(number, {}).get('sid') != sid:
+                return None
+            self.sessions[sid] = (game_id, number)
+        return number
+
+    def is_expired(self, game, idle_for, now):
+        """Whether a game that has been idle for ``idle_for`` seconds can go"""
+        if idle_for >= self.idle_ttl:
+            return True
+        if game['board'].is_over and idle_for >= self.finished_ttl:
+            return True
+        # Abandoned: nobody came back within the reconnect grace window
+        return all(
+            info.get('away') is not None and now - info['away'] >= self.reconnect_grace
+            for info in game['players'].values() if not info.get('bot')
+        )
+
+    def sweep(self, now=None):
+        """Evict expired games and return their ids"""
+        now = now or time.time()
+        shortest = min(self.reconnect_grace, self.finished_ttl, self.idle_ttl)
+        evicted = []
+        for game_id in self.store.idle(now - shortest):
+            game = self.store.get(game_id, touch=False)
+            if game is None:
+                continue
+            if self.is_expired(game, now - game.get('updatedAt', 0), now):
+                self.store.evict(game_id)
+                for info in game['players'].values():
+                    if info.get('sid'):
+                        self.sessions.pop(info['sid'], None)
+                evicted.append(game_id)
+        return evicted
@@ -0,0 +1,127 @@
+"""Structured, non-blocking logging.
+
+Handlers only put records on an in-memory queue. A ``QueueListener`` formats
+them as JSON lines and writes them to stdout, off the request path. Each
+logging call first checks ``isEnabledFor``, so calls below LOG_LEVEL (debug,
+in production) return before building a record.
+
+The listener runs on a real OS thread even after gevent's ``patch_all()``,
+which would otherwise turn it into a greenlet on the event loop.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import sys
+import traceback
+
+try:
+    from gevent import monkey
+except ImportError:
+    from _thread import allocate_lock, start_new_thread
+    from queue import SimpleQueue
+else:
+    allocate_lock, start_new_thread = monkey.get_original('_thread', ['allocate_lock', 'start_new_thread'])
+    SimpleQueue = monkey.get_original('queue', 'SimpleQueue')
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Leave formatting to the listener; only capture what can't wait
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = ''.join(traceback.format_exception(*record.exc_info))
+            record.exc_info = None
+        return record
+
+
+class _ThreadListener(logging.handlers.QueueListener):
+    """``QueueListener`` on an unpatched thread, with an unpatched queue"""
+
+    def start(self):
+        self._stopped = allocate_lock()
+        self._stopped.acquire()
+        start_new_thread(self._run, ())
+
+    def _run(self):
+        try:
+            self._monitor()
+        finally:
+            self._stopped.release()
+
+    def stop(self):
+        self.enqueue_sentinel()
+        # Bounded, so a wedged stdout can't hang the exit
+        self._stopped.acquire(timeout=5)
+
+
+class StructuredLogger:
+    """``log.info('move_made', game=game_id, col=col)``-style wrapper"""
+
+    def __init__(self, logger, listener=None):
+        self._logger = logger
+        self._listener = listener
+
+    def start(self):
+        """Start writing queued records out; later calls do nothing"""
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.start()
+            atexit.register(listener.stop)
+
+    def _log(self, level, msg, fields, exc_info=False):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, msg, extra={'fields': fields}, exc_info=exc_info)
+
+    def debug(self, msg, **fields):
+        self._log(logging.DEBUG, msg, fields)
+
+    def info(self, msg, **fields):
+        self._log(logging.INFO, msg, fields)
+
+    def warning(self, msg, **fields):
+        self._log(logging.WARNING, msg, fields)
+
+    def error(self, msg, **fields):
+        self._log(logging.ERROR, msg, fields)
+
+    def exception(self, msg, **fields):
+        self._log(logging.ERROR, msg, fields, exc_info=True)
+
+
+def setup_logging(name='connect4', level='INFO', stream=None, start=True):
+    """Route ``name`` through a queue to a JSON stream handler.
+
+    With ``start=False`` records wait in the queue until ``start()`` is
+    called on the returned logger, so importing a module does not spawn
+    the listener thread.
+    """
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    records = SimpleQueue()
+    listener = _ThreadListener(records, output, respect_handler_level=False)
+
+    logger = logging.getLogger(name)
+    logger.handlers[:] = [_QueueHandler(records)]
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+    log = StructuredLogger(logger, listener)
+    if start:
+        log.start()
+    return log
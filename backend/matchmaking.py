@@ -0,0 +1,127 @@
+"""Matchmaking queue and lobby of open games, both held in worker memory.
+
+``MatchQueue`` groups waiting players into rating buckets. Pairing happens in
+batches: the server calls ``tick`` on a timer instead of searching on every
+request. Players in the same bucket pair in arrival order. A player left
+alone in a bucket is offered to the neighbouring bucket once both players
+have waited long enough for their rating windows to cover the gap.
+
+``LobbyIndex`` is updated as games open and fill, so listing a page costs
+the page size, not the number of games.
+"""
+
+from bisect import bisect_right
+
+
+class MatchQueue:
+    def __init__(self, bucket_width=100, widen_per_second=20, max_spread=400):
+        self.bucket_width = bucket_width
+        self.widen_per_second = widen_per_second
+        self.max_spread = max_spread
+        # bucket -> {sid: ticket}, oldest first (dicts keep insertion order)
+        self._buckets = {}
+        self._bucket_of = {}
+
+    def add(self, sid, ticket):
+        """Queue ``ticket`` (a dict with ``rating`` and ``since``) for ``sid``"""
+        self.remove(sid)
+        bucket = int(ticket['rating']) // self.bucket_width
+        self._buckets.setdefault(bucket, {})[sid] = ticket
+        self._bucket_of[sid] = bucket
+
+    def remove(self, sid):
+        bucket = self._bucket_of.pop(sid, None)
+        if bucket is None:
+            return None
+        waiting = self._buckets[bucket]
+        ticket = waiting.pop(sid)
+        if not waiting:
+            del self._buckets[bucket]
+        return ticket
+
+    def spread(self, ticket, now):
+        """Rating difference ``ticket`` accepts after waiting until ``now``"""
+        waited = max(0.0, now - ticket['since'])
+        return min(self.max_spread, self.bucket_width + waited * self.widen_per_second)
+
+    def tick(self, now):
+        """Pair everyone who can be paired; returns ``[(sid, ticket, sid, ticket)]``"""
+        pairs = []
+        leftovers = []
+        for bucket in sorted(self._buckets):
+            waiting = list(self._buckets[bucket].items())
+            for index in range(0, len(waiting) - 1, 2):
+                pairs.append(waiting[index] + waiting[index + 1])
+            if len(waiting) % 2:
+                leftovers.append(waiting[-1])
+
+        # At most one player per bucket is left, already in rating order
+        index = 0
+        while index < len(leftovers) - 1:
+            (first_sid, first), (second_sid, second) = leftovers[index], leftovers[index + 1]
+            gap = abs(first['rating'] - second['rating'])
+            if gap <= min(self.spread(first, now), self.spread(second, now)):
+                pairs.append((first_sid, first, second_sid, second))
+                index += 2
+            else:
+                index += 1
+
+        for first_sid, _, second_sid, _ in pairs:
+            self.remove(first_sid)
+            self.remove(second_sid)
+        return pairs
+
+    def __len__(self):
+        return len(self._bucket_of)
+
+    def __contains__(self, sid):
+        return sid in self._bucket_of
+
+
+class LobbyIndex:
+    """Games waiting for a second player, listed oldest first"""
+
+    def __init__(self):
+        self._entries = {}
+        # Positions in creation order; removed games are skipped until compaction
+        self._order = []
+        self._ids = {}
+        self._next = 0
+
+    def add(self, game_id, info):
+        self.remove(game_id)
+        position = self._next
+        self._next += 1
+        self._entries[game_id] = (position, info)
+        self._order.append(position)
+        self._ids[position] = game_id
+
+    def remove(self, game_id):
+        entry = self._entries.pop(game_id, None)
+        if entry is None:
+            return
+        del self._ids[entry[0]]
+        if len(self._order) > 2 * len(self._ids) + 64:
+            self._order = [position for position in self._order if position in self._ids]
+
+    def page(self, cursor=None, limit=20):
+        """Up to ``limit`` games after ``cursor``, plus the cursor for the next page"""
+        start = bisect_right(self._order, cursor) if cursor is not None else 0
+        games = []
+        last = None
+        for index in range(start, len(self._order)):
+            position = self._order[index]
+            game_id = self._ids.get(position)
+            if game_id is None:
+                continue
+            if len(games) == limit:
+                return games, last
+            games.append(dict(self._entries[game_id][1], gameId=game_id))
+            last = position
+        return games, None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, game_id):
+        return game_id in self._entries
@@ -0,0 +1,96 @@
+"""In-process metrics rendered in the Prometheus text format.
+
+Counters and histograms are plain dicts updated from socket handlers. Each
+worker reports its own numbers; Prometheus sums them across scrape targets.
+"""
+
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound):
+    return repr(float(bound))
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        # One slot per bucket plus the +Inf overflow; made cumulative on render
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self):
+        self.events = {}
+        self.latency = {}
+        self.errors = {}
+        self.connections = 0
+
+    def observe_event(self, event, seconds):
+        self.events[event] = self.events.get(event, 0) + 1
+        histogram = self.latency.get(event)
+        if histogram is None:
+            histogram = self.latency[event] = Histogram()
+        histogram.observe(seconds)
+
+    def count_error(self, kind):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def render(self, gauges=None, counters=None):
+        """Prometheus text exposition of every metric, plus extra ``gauges`` and ``counters``
+
+        Extra counters are totals kept elsewhere; each is exported with a
+        ``_total`` suffix.
+        """
+        lines = [
+            '# HELP connect4_socket_events_total Socket.IO events handled.',
+            '# TYPE connect4_socket_events_total counter',
+        ]
+        for event, count in sorted(self.events.items()):
+            lines.append(f'connect4_socket_events_total{{event="{_escape(event)}"}} {count}')
+
+        lines += [
+            '# HELP connect4_event_duration_seconds Socket.IO handler latency.',
+            '# TYPE connect4_event_duration_seconds histogram',
+        ]
+        for event, histogram in sorted(self.latency.items()):
+            label = _escape(event)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'connect4_event_duration_seconds_bucket{{event="{label}",le="{_format_bound(bound)}"}} {cumulative}')
+            lines.append(f'connect4_event_duration_seconds_bucket{{event="{label}",le="+Inf"}} {histogram.count}')
+            lines.append(f'connect4_event_duration_seconds_sum{{event="{label}"}} {histogram.sum}')
+            lines.append(f'connect4_event_duration_seconds_count{{event="{label}"}} {histogram.count}')
+
+        lines += [
+            '# HELP connect4_errors_total Errors by type: exceptions and rejected requests.',
+            '# TYPE connect4_errors_total counter',
+        ]
+        for kind, count in sorted(self.errors.items()):
+            lines.append(f'connect4_errors_total{{type="{_escape(kind)}"}} {count}')
+
+        gauges = dict(gauges or {})
+        gauges.setdefault('connections', self.connections)
+        for name, value in sorted(gauges.items()):
+            lines.append(f'# TYPE connect4_{name} gauge')
+            lines.append(f'connect4_{name} {value}')
+        for name, value in sorted((counters or {}).items()):
+            lines.append(f'# TYPE connect4_{name}_total counter')
+            lines.append(f'connect4_{name}_total {value}')
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,13 @@
+"""Headless self-play and tournaments, with no sockets involved.
+
+Run from the backend directory:
+
+    python -m selfplay random greedy --games 10000                # round robin
+    python -m selfplay greedy ai:easy --games 200 --output games.csv
+    python -m selfplay center --games 5000 --output games.parquet  # self-play
+
+Games follow the engine's rules and bit layout. Each game is written as one
+row: the players, the winner (0 for a draw), the length, and the moves as a
+digit string. The summary printed as JSON has win rates, game lengths and
+move histograms.
+"""
@@ -0,0 +1,35 @@
+import argparse
+import json
+import sys
+
+from selfplay import runner
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m selfplay', description='Connect Four self-play tournaments')
+    parser.add_argument('strategies', nargs='+', help='random, center, greedy or ai:<difficulty>')
+    parser.add_argument('--games', type=int, default=1000, help='games per pairing')
+    parser.add_argument('--batch', type=int, default=500, help='games per shard, played as one batch')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes; 0 plays in this process')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='per-game rows: *.csv, or *.parquet with pyarrow installed')
+    parser.add_argument('--summary', help='also write the JSON summary to this file')
+
+    args = parser.parse_args(argv)
+    try:
+        summary = runner.run(args.strategies, games=args.games, batch_size=args.batch,
+                             workers=args.workers, seed=args.seed, output=args.output)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    text = json.dumps(summary, indent=2)
+    # Without --output the game rows go to stdout, so keep the summary on stderr
+    print(text, file=sys.stdout if args.output else sys.stderr)
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            f.write(text + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Thousands of boards stepped together as NumPy arrays of bitboards.
+
+The layout is the engine's: column ``c`` owns bits ``c*7 .. c*7+5`` plus a
+sentinel bit on top. This lets the shift-and-mask test of
+``engine.has_four`` run on a whole ``uint64`` array in one call.
+"""
+
+import numpy as np
+
+from engine import COLS, COLUMN_HEIGHT, DIRECTIONS, ROWS
+
+CELLS = ROWS * COLS
+RUNNING = -1
+DRAW = 0
+
+_ONE = np.uint64(1)
+_SHIFTS = tuple((np.uint64(shift), np.uint64(2 * shift)) for shift in DIRECTIONS)
+
+
+def has_four(bitboards):
+    """Vectorized ``engine.has_four``: one bool per bitboard"""
+    found = np.zeros(bitboards.shape, dtype=bool)
+    for shift, double in _SHIFTS:
+        pairs = bitboards & (bitboards >> shift)
+        found |= (pairs & (pairs >> double)) != 0
+    return found
+
+
+class BoardBatch:
+    """``count`` games started together; every running game moves on each ``play``"""
+
+    def __init__(self, count):
+        self.count = count
+        # One row per player; player 1 always moves first
+        self.bitboards = np.zeros((2, count), dtype=np.uint64)
+        self.heights = np.zeros((count, COLS), dtype=np.int8)
+        self.moves = np.zeros(count, dtype=np.int16)
+        self.winner = np.full(count, RUNNING, dtype=np.int8)
+        self.history = np.full((count, CELLS), -1, dtype=np.int8)
+
+    @property
+    def running(self):
+        return self.winner == RUNNING
+
+    def legal_mask(self):
+        """``(count, COLS)`` bools: columns with room, on games still running"""
+        return (self.heights < ROWS) & self.running[:, None]
+
+    def drop_bits(self):
+        """``(count, COLS)`` bit a disc dropped in each column would take"""
+        shifts = np.arange(COLS, dtype=np.uint64) * np.uint64(COLUMN_HEIGHT) + self.heights.astype(np.uint64)
+        return _ONE << shifts
+
+    def play(self, cols):
+        """Drop a disc in ``cols[i]`` on every running board ``i``"""
+        games = np.flatnonzero(self.running)
+        col = np.asarray(cols)[games].astype(np.intp)
+        height = self.heights[games, col]
+        if (height >= ROWS).any():
+            raise ValueError('Column is full')
+
+        side = self.moves[games] & 1
+        bits = _ONE << (col.astype(np.uint64) * np.uint64(COLUMN_HEIGHT) + height.astype(np.uint64))
+        self.bitboards[side, games] |= bits
+        self.heights[games, col] += 1
+        self.history[games, self.moves[games]] = col
+        self.moves[games] += 1
+
+        # Only the player who just moved can have made four
+        won = has_four(self.bitboards[side, games])
+        self.winner[games[won]] = side[won] + 1
+        full = ~won & (self.moves[games] == CELLS)
+        self.winner[games[full]] = DRAW
+
+    def move_strings(self):
+        """Each game's columns as a digit string, e.g. ``'3344556'``"""
+        digits = (self.history + ord('0')).astype(np.uint8)
+        return [digits[game, :length].tobytes().decode() for game, length in enumerate(self.moves)]
+
+    def histograms(self):
+        """``(2, COLS)`` counts of the columns each player chose"""
+        counts = np.zeros((2, COLS), dtype=np.int64)
+        for side in (0, 1):
+            cols = self.history[:, side::2]
+            counts[side] = np.bincount(cols[cols >= 0], minlength=COLS)
+        return counts
@@ -0,0 +1,208 @@
+"""Tournaments sharded across a process pool, with streamed per-game output.
+
+Each pairing is split into shards of ``batch_size`` games. A worker process
+plays a whole shard as one ``BoardBatch``. Shard results are written as soon
+as they arrive, one row per game, so a long run can be watched and stopped.
+Aggregates are kept in the parent process.
+"""
+
+import csv
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from engine import COLS
+from selfplay.batch import CELLS, BoardBatch
+from selfplay.strategies import get_strategy
+
+FIELDS = ('first', 'second', 'game', 'winner', 'length', 'moves')
+
+
+def play_shard(first, second, count, seed, start=0):
+    """Play ``count`` games of ``first`` (player 1) against ``second``"""
+    strategies = (get_strategy(first), get_strategy(second))
+    rng = np.random.default_rng(seed)
+    batch = BoardBatch(count)
+    ply = 0
+    while batch.running.any():
+        side = ply & 1
+        batch.play(strategies[side](batch, side, rng))
+        ply += 1
+    return {
+        'first': first,
+        'second': second,
+        'start': start,
+        'winners': batch.winner.tolist(),
+        'lengths': batch.moves.tolist(),
+        'moves': batch.move_strings(),
+        'histograms': batch.histograms().tolist(),
+    }
+
+
+class CsvWriter:
+    def __init__(self, path=None):
+        self._file = open(path, 'w', newline='') if path else None
+        self._writer = csv.writer(self._file or sys.stdout)
+        self._writer.writerow(FIELDS)
+
+    def write(self, shard):
+        for offset, row in enumerate(zip(shard['winners'], shard['lengths'], shard['moves'])):
+            self._writer.writerow((shard['first'], shard['second'], shard['start'] + offset) + row)
+        if self._file:
+            self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+class ParquetWriter:
+    """One row group per shard; needs pyarrow"""
+
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema([
+            ('first', pa.string()), ('second', pa.string()), ('game', pa.int32()),
+            ('winner', pa.int8()), ('length', pa.int16()), ('moves', pa.string()),
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, shard):
+        count = len(shard['winners'])
+        columns = [
+            [shard['first']] * count,
+            [shard['second']] * count,
+            list(range(shard['start'], shard['start'] + count)),
+            shard['winners'],
+            shard['lengths'],
+            shard['moves'],
+        ]
+        self._writer.write_table(self._pa.Table.from_arrays(columns, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def open_writer(path=None):
+    """Parquet for ``*.parquet`` paths, CSV otherwise (stdout without a path)"""
+    if path and path.endswith('.parquet'):
+        return ParquetWriter(path)
+    return CsvWriter(path)
+
+
+class Standings:
+    """Win rates, game lengths and move histograms, per pairing and strategy"""
+
+    def __init__(self):
+        self.pairings = {}
+        self.players = {}
+
+    def add(self, shard):
+        key = (shard['first'], shard['second'])
+        pairing = self.pairings.setdefault(key, {
+            'games': 0, 'first_wins': 0, 'second_wins': 0, 'draws': 0,
+            'length_total': 0, 'lengths': [0] * (CELLS + 1),
+            'histograms': [[0] * COLS, [0] * COLS],
+        })
+        winners = np.asarray(shard['winners'])
+        lengths = np.asarray(shard['lengths'])
+        pairing['games'] += len(winners)
+        pairing['first_wins'] += int((winners == 1).sum())
+        pairing['second_wins'] += int((winners == 2).sum())
+        pairing['draws'] += int((winners == 0).sum())
+        pairing['length_total'] += int(lengths.sum())
+        for length, count in enumerate(np.bincount(lengths, minlength=len(pairing['lengths']))):
+            pairing['lengths'][length] += int(count)
+        for side in (0, 1):
+            pairing['histograms'][side] = [a + b for a, b in zip(pairing['histograms'][side], shard['histograms'][side])]
+
+        for name, won, lost in ((shard['first'], 1, 2), (shard['second'], 2, 1)):
+            player = self.players.setdefault(name, {'games': 0, 'wins': 0, 'losses': 0, 'draws': 0})
+            player['games'] += len(winners)
+            player['wins'] += int((winners == won).sum())
+            player['losses'] += int((winners == lost).sum())
+            player['draws'] += int((winners == 0).sum())
+
+    @staticmethod
+    def _length_percentile(counts, total, fraction):
+        target = fraction * total
+        seen = 0
+        for length, count in enumerate(counts):
+            seen += count
+            if seen >= target and count:
+                return length
+        return None
+
+    def summary(self):
+        pairings = []
+        for (first, second), pairing in sorted(self.pairings.items()):
+            games = pairing['games']
+            pairings.append({
+                'first': first,
+                'second': second,
+                'games': games,
+                'first_win_rate': round(pairing['first_wins'] / games, 4),
+                'second_win_rate': round(pairing['second_wins'] / games, 4),
+                'draw_rate': round(pairing['draws'] / games, 4),
+                'mean_length': round(pairing['length_total'] / games, 2),
+                'median_length': self._length_percentile(pairing['lengths'], games, 0.5),
+                'move_histogram': {'first': pairing['histograms'][0], 'second': pairing['histograms'][1]},
+            })
+        players = {}
+        for name, player in sorted(self.players.items()):
+            players[name] = dict(player, score=round((player['wins'] + player['draws'] / 2) / player['games'], 4))
+        return {'pairings': pairings, 'players': players}
+
+
+def pairings_for(strategies):
+    """Every ordered pair, so each strategy plays both colors; one name plays itself"""
+    if len(strategies) == 1:
+        return [(strategies[0], strategies[0])]
+    return [(a, b) for a in strategies for b in strategies if a != b]
+
+
+def run(strategies, games=1000, batch_size=500, workers=None, seed=0, output=None):
+    for name in strategies:
+        get_strategy(name)  # fail fast on a typo, before starting any process
+
+    shards = []
+    for number, (first, second) in enumerate(pairings_for(strategies)):
+        for start in range(0, games, batch_size):
+            shards.append((first, second, min(batch_size, games - start), seed + number * games + start, start))
+
+    standings = Standings()
+    writer = open_writer(output)
+    started = time.perf_counter()
+    try:
+        if workers == 0:
+            for shard in shards:
+                result = play_shard(*shard)
+                writer.write(result)
+                standings.add(result)
+        else:
+            # spawn, like the server's search pool: no forked sockets or locks
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                for future in as_completed([pool.submit(play_shard, *shard) for shard in shards]):
+                    result = future.result()
+                    writer.write(result)
+                    standings.add(result)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - started
+
+    total = sum(pairing['games'] for pairing in standings.pairings.values())
+    return {
+        'strategies': list(strategies),
+        'games': total,
+        'shards': len(shards),
+        'seconds': round(elapsed, 3),
+        'games_per_second': round(total / elapsed, 1) if elapsed else None,
+        **standings.summary(),
+    }
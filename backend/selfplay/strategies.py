@@ -0,0 +1,76 @@
+"""Move choosers for self-play.
+
+A strategy takes ``(batch, side, rng)`` and returns one column per board.
+Entries for finished boards are ignored. ``side`` is 0 for player 1 and 1
+for player 2. All boards in a batch are on the same ply, so one side moves
+on every running board at once.
+"""
+
+import numpy as np
+
+from ai import DIFFICULTIES, choose_move
+from selfplay.batch import has_four
+
+# Favor the middle columns, the way the search orders its moves
+CENTER_WEIGHTS = np.array([1, 2, 3, 4, 3, 2, 1], dtype=np.float64)
+
+
+def _pick(scores, legal):
+    """Highest-scoring legal column per board"""
+    scores = np.where(legal, scores, -1.0)
+    return scores.argmax(axis=1)
+
+
+def random_moves(batch, side, rng):
+    legal = batch.legal_mask()
+    return _pick(rng.random(legal.shape), legal)
+
+
+def center_moves(batch, side, rng):
+    """Random, weighted towards the center columns"""
+    legal = batch.legal_mask()
+    # Weighted sampling without a loop: u ** (1 / w) keeps the weights' odds
+    return _pick(rng.random(legal.shape) ** (1.0 / CENTER_WEIGHTS), legal)
+
+
+def greedy_moves(batch, side, rng):
+    """Win if possible, else block the opponent's win, else play center_moves"""
+    legal = batch.legal_mask()
+    bits = batch.drop_bits()
+    mine = batch.bitboards[side][:, None] | bits
+    theirs = batch.bitboards[1 - side][:, None] | bits
+    wins = has_four(mine) & legal
+    blocks = has_four(theirs) & legal
+    scores = rng.random(legal.shape) ** (1.0 / CENTER_WEIGHTS)
+    scores = scores + blocks * 2.0 + wins * 4.0
+    return _pick(scores, legal)
+
+
+def search_moves(difficulty):
+    """The server's computer opponent; searches one board at a time"""
+    def moves(batch, side, rng):
+        cols = np.zeros(batch.count, dtype=np.intp)
+        for game in np.flatnonzero(batch.running):
+            bitboards = [int(batch.bitboards[0, game]), int(batch.bitboards[1, game])]
+            cols[game], _ = choose_move(bitboards, difficulty)
+        return cols
+    return moves
+
+
+STRATEGIES = {
+    'random': random_moves,
+    'center': center_moves,
+    'greedy': greedy_moves,
+}
+
+
+def get_strategy(name):
+    """``random``, ``center``, ``greedy`` or ``ai:<difficulty>``"""
+    if name.startswith('ai:'):
+        difficulty = name[3:]
+        if difficulty not in DIFFICULTIES:
+            raise ValueError(f'Unknown difficulty: {difficulty}')
+        return search_moves(difficulty)
+    if name not in STRATEGIES:
+        raise ValueError(f'Unknown strategy: {name}')
+    return STRATEGIES[name]
@@ -0,0 +1,99 @@
+"""Spectator fan-out: one encoded packet per update, shared by every watcher.
+
+Spectators sit in their own Socket.IO room, ``watch:<game_id>``, apart from
+the two players. Move handlers do not send to them. A background task polls
+the watched games instead, and for each game that changed it encodes a
+single snapshot packet and writes that packet to every spectator. Moves made
+between polls are coalesced into the next snapshot, and games with a large
+audience are polled less often.
+
+If a spectator's outgoing queue is backed up, it skips updates until the
+queue drains. Every update is a full snapshot, so the next one it gets is
+complete. Because games are read from the store, spectators on one worker
+can follow games played on another.
+"""
+
+from engineio import packet as eio_packet
+from socketio import packet
+
+
+def watch_room(game_id):
+    return f'watch:{game_id}'
+
+
+class SpectatorHub:
+    def __init__(self, server, namespace='/', interval=0.25, large_audience=200, max_backlog=16):
+        self.server = server
+        self.namespace = namespace
+        self.interval = interval
+        self.large_audience = large_audience
+        self.max_backlog = max_backlog
+        self.watching = {}
+        self.audience = {}
+        # game_id -> (version last sent, when it was sent)
+        self._sent = {}
+        self.packets = 0
+        self.deliveries = 0
+        self.skipped = 0
+
+    def watch(self, sid, game_id, version=None, now=0.0):
+        """Add a spectator who has been sent the game at ``version``"""
+        self.unwatch(sid)
+        if game_id not in self.audience:
+            self._sent[game_id] = (version, now)
+        self.watching[sid] = game_id
+        self.audience[game_id] = self.audience.get(game_id, 0) + 1
+        self.server.enter_room(sid, watch_room(game_id), namespace=self.namespace)
+
+    def unwatch(self, sid):
+        game_id = self.watching.pop(sid, None)
+        if game_id is None:
+            return None
+        self.audience[game_id] -= 1
+        if not self.audience[game_id]:
+            del self.audience[game_id]
+            self._sent.pop(game_id, None)
+        self.server.leave_room(sid, watch_room(game_id), namespace=self.namespace)
+        return game_id
+
+    def close(self, game_id):
+        """Drop every spectator of a game that no longer exists"""
+        for sid, _ in list(self.server.manager.get_participants(self.namespace, watch_room(game_id))):
+            self.unwatch(sid)
+
+    def due(self, now):
+        """``(game_id, version)`` of watched games that may be refreshed at ``now``"""
+        ready = []
+        for game_id, count in self.audience.items():
+            interval = self.interval * 4 if count >= self.large_audience else self.interval
+            version, sent_at = self._sent.get(game_id, (None, 0.0))
+            if now - sent_at >= interval:
+                ready.append((game_id, version))
+        return ready
+
+    def encode(self, event, data):
+        """Engine.IO packets for ``event``, built once for any number of sends"""
+        encoded = self.server.packet_class(packet.EVENT, namespace=self.namespace, data=[event, data]).encode()
+        if not isinstance(encoded, list):
+            encoded = [encoded]
+        return [eio_packet.Packet(eio_packet.MESSAGE, part) for part in encoded]
+
+    def backlog(self, eio_sid):
+        """Packets queued for a connection but not yet written to it"""
+        socket = self.server.eio.sockets.get(eio_sid)
+        queue = getattr(socket, 'queue', None)
+        return queue.qsize() if queue is not None else 0
+
+    def broadcast(self, game_id, event, data, version=None, now=None):
+        """Send one encoded packet to every spectator that is keeping up"""
+        packets = self.encode(event, data)
+        self.packets += 1
+        for _, eio_sid in self.server.manager.get_participants(self.namespace, watch_room(game_id)):
+            if self.backlog(eio_sid) >= self.max_backlog:
+                self.skipped += 1
+                continue
+            for part in packets:
+                self.server.eio.send_packet(eio_sid, part)
+            self.deliveries += 1
+        if now is not None and game_id in self.audience:
+            self._sent[game_id] = (version, now)
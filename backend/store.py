@@ -0,0 +1,270 @@
+"""Game state storage.
+
+Handlers load a game with ``get``, change it, and write it back with ``save``.
+``save`` is a compare-and-set on the game's ``rev`` counter. If another worker
+saved the game in between, the write is rejected and ``save`` returns False.
+
+Both backends keep games in least-recently-used order. Once ``max_games`` is
+reached, each new game evicts the least recently used one.
+"""
+
+import json
+import time
+from collections import OrderedDict
+
+from engine import Board
+
+
+def encode_game(game):
+    """Serialize a game dict, including its Board, to JSON"""
+    data = dict(game)
+    data['board'] = game['board'].to_dict()
+    return json.dumps(data, separators=(',', ':'))
+
+
+def decode_game(payload):
+    """Game dict from ``encode_game`` output, or from that JSON already parsed"""
+    data = dict(payload) if isinstance(payload, dict) else json.loads(payload)
+    data['board'] = Board.from_dict(data['board'])
+    # JSON object keys are always strings; player numbers are ints everywhere else
+    data['players'] = {int(num): info for num, info in data['players'].items()}
+    return data
+
+
+class GameStore:
+    """Interface shared by the storage backends"""
+
+    def get(self, game_id, touch=True):
+        """Return the game dict, or ``None`` if there is no such game.
+
+        Reads count as use for LRU eviction unless ``touch`` is False.
+        """
+        raise NotImplementedError
+
+    def put(self, game_id, game, replace=True):
+        """Store a new game, replacing any existing game with the same id.
+
+        Returns the ids of games evicted to stay within ``max_games``. With
+        ``replace=False`` the check and the write are one atomic step, and an
+        existing game is kept; ``put`` then returns ``None``.
+        """
+        raise NotImplementedError
+
+    def save(self, game_id, game):
+        """Write back a game loaded with ``get``; False if it changed meanwhile"""
+        raise NotImplementedError
+
+    def delete(self, game_id):
+        raise NotImplementedError
+
+    def evict(self, game_id):
+        """Delete a game and count it as evicted"""
+        raise NotImplementedError
+
+    def idle(self, before):
+        """Ids of games not read or written since timestamp ``before``"""
+        raise NotImplementedError
+
+    @property
+    def evicted(self):
+        raise NotImplementedError
+
+    def ids(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def __contains__(self, game_id):
+        return self.get(game_id, touch=False) is not None
+
+
+class MemoryStore(GameStore):
+    """In-process store; games are live dicts, so only one worker can use it"""
+
+    def __init__(self, max_games=None):
+        self.max_games = max_games
+        # Oldest access first; the touch times are in the same order
+        self._games = OrderedDict()
+        self._revs = {}
+        self._touched = {}
+        self._evicted = 0
+
+    def _touch(self, game_id):
+        self._games.move_to_end(game_id)
+        self._touched[game_id] = time.time()
+
+    def get(self, game_id, touch=True):
+        game = self._games.get(game_id)
+        if game is not None and touch:
+            self._touch(game_id)
+        return game
+
+    def put(self, game_id, game, replace=True):
+        if not replace and game_id in self._games:
+            return None
+        evicted = []
+        if game_id not in self._games and self.max_games and len(self._games) >= self.max_games:
+            evicted.append(next(iter(self._games)))
+            self.evict(evicted[0])
+        game['rev'] = 0
+        game['updatedAt'] = time.time()
+        self._games[game_id] = game
+        self._revs[game_id] = 0
+        self._touch(game_id)
+        return evicted
+
+    def save(self, game_id, game):
+        if self._revs.get(game_id) != game['rev']:
+            return False
+        game['rev'] += 1
+        game['updatedAt'] = time.time()
+        self._games[game_id] = game
+        self._revs[game_id] = game['rev']
+        self._touch(game_id)
+        return True
+
+    def delete(self, game_id):
+        self._games.pop(game_id, None)
+        self._revs.pop(game_id, None)
+        self._touched.pop(game_id, None)
+
+    def evict(self, game_id):
+        if game_id in self._games:
+            self.delete(game_id)
+            self._evicted += 1
+
+    def idle(self, before):
+        stale = []
+        for game_id in self._games:
+            if self._touched[game_id] >= before:
+                break
+            stale.append(game_id)
+        return stale
+
+    @property
+    def evicted(self):
+        return self._evicted
+
+    def ids(self):
+        return list(self._games.keys())
+
+    def __len__(self):
+        return len(self._games)
+
+    def __contains__(self, game_id):
+        return game_id in self._games
+
+
+class RedisStore(GameStore):
+    """Store shared by all workers, backed by any Redis-protocol server"""
+
+    def __init__(self, client, prefix='c4', max_games=None):
+        self._redis = client
+        self._prefix = prefix
+        self.max_games = max_games
+        # Sorted set of game ids scored by last access time
+        self._index = f'{prefix}:games'
+        self._evicted_key = f'{prefix}:evicted'
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _key(self, game_id):
+        return f'{self._prefix}:game:{game_id}'
+
+    def get(self, game_id, touch=True):
+        if touch:
+            with self._redis.pipeline() as pipe:
+                pipe.get(self._key(game_id))
+                pipe.zadd(self._index, {game_id: time.time()}, xx=True)
+                payload, _ = pipe.execute()
+        else:
+            payload = self._redis.get(self._key(game_id))
+        if payload is None:
+            return None
+        return decode_game(payload)
+
+    def put(self, game_id, game, replace=True):
+        game['rev'] = 0
+        game['updatedAt'] = time.time()
+        with self._redis.pipeline() as pipe:
+            pipe.set(self._key(game_id), encode_game(game), nx=not replace)
+            pipe.zadd(self._index, {game_id: time.time()})
+            pipe.zcard(self._index)
+            stored, _, count = pipe.execute()
+        if not stored:
+            return None
+        evicted = []
+        if self.max_games and count > self.max_games:
+            for oldest, _ in self._redis.zpopmin(self._index, count - self.max_games):
+                evicted.append(self._decode(oldest))
+                self._redis.delete(self._key(evicted[-1]))
+                self._redis.incr(self._evicted_key)
+        return evicted
+
+    def save(self, game_id, game):
+        from redis.exceptions import WatchError
+
+        key = self._key(game_id)
+        expected = game['rev']
+        with self._redis.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                current = pipe.get(key)
+                if current is None or json.loads(current)['rev'] != expected:
+                    pipe.unwatch()
+                    return False
+                game['rev'] = expected + 1
+                game['updatedAt'] = time.time()
+                pipe.multi()
+                pipe.set(key, encode_game(game))
+                pipe.zadd(self._index, {game_id: time.time()})
+                pipe.execute()
+                return True
+            except WatchError:
+                game['rev'] = expected
+                return False
+
+    def delete(self, game_id):
+        with self._redis.pipeline() as pipe:
+            pipe.delete(self._key(game_id))
+            pipe.zrem(self._index, game_id)
+            pipe.execute()
+
+    def evict(self, game_id):
+        with self._redis.pipeline() as pipe:
+            pipe.delete(self._key(game_id))
+            pipe.zrem(self._index, game_id)
+            removed = pipe.execute()[-1]
+        if removed:
+            self._redis.incr(self._evicted_key)
+
+    def idle(self, before):
+        return [self._decode(game_id) for game_id in self._redis.zrangebyscore(self._index, 0, before)]
+
+    @property
+    def evicted(self):
+        return int(self._redis.get(self._evicted_key) or 0)
+
+    @staticmethod
+    def _decode(game_id):
+        return game_id.decode() if isinstance(game_id, bytes) else game_id
+
+    def ids(self):
+        return [self._decode(game_id) for game_id in self._redis.zrange(self._index, 0, -1)]
+
+    def __len__(self):
+        return self._redis.zcard(self._index)
+
+    def __contains__(self, game_id):
+        return bool(self._redis.exists(self._key(game_id)))
+
+
+def create_store(url=None, max_games=None):
+    """Pick a backend: Redis when a URL is configured, otherwise in-process"""
+    if url:
+        return RedisStore.from_url(url, max_games=max_games)
+    return MemoryStore(max_games=max_games)
@@ -0,0 +1,99 @@
+import pytest
+
+from clock import TimingWheel, charge_turn, new_clock, pause, resume, start_turn, turn_deadline
+
+
+def test_timer_fires_once_when_due():
+    wheel = TimingWheel(tick=0.1, slots=8, now=0)
+    fired = []
+    wheel.schedule(0.25, fired.append, 'a')
+
+    assert wheel.advance(0.2) == 0
+    assert wheel.advance(0.35) == 1
+    assert wheel.advance(1.0) == 0
+    assert fired == ['a']
+    assert wheel.pending == 0
+
+
+def test_timer_beyond_one_revolution_waits_for_its_turn():
+    # 8 slots of 0.1s: a 2.05s deadline shares a bucket with earlier ticks
+    wheel = TimingWheel(tick=0.1, slots=8, now=0)
+    fired = []
+    wheel.schedule(2.05, fired.append, 'late')
+    wheel.schedule(0.25, fired.append, 'early')
+
+    for step in range(1, 21):
+        wheel.advance(step / 10)
+    assert fired == ['early']
+
+    wheel.advance(2.15)
+    assert fired == ['early', 'late']
+
+
+def test_advance_after_a_long_pause_fires_everything_due():
+    wheel = TimingWheel(tick=0.1, slots=8, now=0)
+    fired = []
+    for deadline in (0.3, 1.7, 5.0):
+        wheel.schedule(deadline, fired.append, deadline)
+
+    assert wheel.advance(10.0) == 3
+    assert sorted(fired) == [0.3, 1.7, 5.0]
+
+
+def test_cancel():
+    wheel = TimingWheel(tick=0.1, slots=8, now=0)
+    fired = []
+    timer = wheel.schedule(0.5, fired.append, 'a')
+    wheel.cancel(timer)
+    wheel.cancel(timer)
+
+    assert wheel.pending == 0
+    wheel.advance(1.0)
+    assert fired == []
+
+
+def test_failing_callback_does_not_stop_the_others():
+    errors = []
+    wheel = TimingWheel(tick=0.1, slots=8, now=0, on_error=lambda timer, exc: errors.append(exc))
+    fired = []
+
+    def fail():
+        raise ConnectionError('store down')
+
+    wheel.schedule(0.2, fail)
+    wheel.schedule(0.2, fired.append, 'a')
+    wheel.advance(0.5)
+
+    assert fired == ['a']
+    assert [type(exc) for exc in errors] == [ConnectionError]
+
+
+def test_failing_callback_raises_without_on_error():
+    wheel = TimingWheel(tick=0.1, slots=8, now=0)
+    wheel.schedule(0.2, int, 'not a number')
+
+    with pytest.raises(ValueError):
+        wheel.advance(0.5)
+
+
+def test_paused_turn_keeps_its_spent_time():
+    clock = new_clock(600)
+    start_turn(clock, 100.0)
+    pause(clock, 110.0)
+    assert clock['turnStartedAt'] is None
+
+    resume(clock, 500.0)
+    assert turn_deadline(clock, 1, 30) == 520.0
+    assert charge_turn(clock, 1, 515.0, 30)
+    assert clock['remaining'][0] == 575.0
+
+
+def test_start_turn_forgets_a_held_turn():
+    clock = new_clock(600)
+    start_turn(clock, 0.0)
+    pause(clock, 20.0)
+    start_turn(clock, 50.0)
+    pause(clock, 51.0)
+    resume(clock, 60.0)
+
+    assert turn_deadline(clock, 1, 30) == 89.0
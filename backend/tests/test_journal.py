@@ -0,0 +1,201 @@
+import os
+
+import pytest
+
+from engine import Board
+from journal import BYTE_RECORD, EVICT, MOVE, START, Journal
+
+
+def new_game(game_id='A'):
+    return {
+        'board': Board(),
+        'seq': 0,
+        'players': {1: {'id': f'{game_id.lower()}1', 'name': 'One', 'sid': 's1', 'away': None}},
+    }
+
+
+def play(journal, game, col):
+    game['board'].play(col)
+    game['seq'] += 1
+    journal.move(game, col)
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path)
+
+
+def segment_path(directory, number=1):
+    return os.path.join(directory, f'journal-{number:06d}.log')
+
+
+def test_move_record_is_six_bytes(directory):
+    journal = Journal(directory)
+    game = new_game()
+    journal.start('A', game)
+    journal.flush()
+    start_size = os.path.getsize(segment_path(directory))
+
+    play(journal, game, 3)
+    journal.flush()
+
+    with open(segment_path(directory), 'rb') as f:
+        data = f.read()
+    assert len(data) - start_size == BYTE_RECORD.size == 6
+    assert BYTE_RECORD.unpack_from(data, start_size) == (MOVE, game['journal'], 3)
+    assert data[0] == START
+
+
+def test_recover_from_journal_alone(directory):
+    journal = Journal(directory)
+    game = new_game()
+    journal.start('A', game)
+    game['players'][2] = {'id': 'a2', 'name': 'Two', 'sid': 's2', 'away': None}
+    journal.join(game, 2)
+    for col in (3, 3, 4):
+        play(journal, game, col)
+    journal.flush()
+    journal.close()
+
+    recovered = Journal(directory).recover()
+
+    game_a = recovered['A']
+    assert game_a['board'].to_dict() == game['board'].to_dict()
+    assert game_a['seq'] == 3
+    assert game_a['players'][2]['id'] == 'a2'
+    # Nobody is connected after a restart; seats wait for a rejoin
+    assert all(info['sid'] is None and info['away'] is not None for info in game_a['players'].values())
+
+
+def test_recover_from_snapshot_plus_tail(directory):
+    journal = Journal(directory)
+    games = {'A': new_game('A'), 'B': new_game('B')}
+    for game_id, game in games.items():
+        journal.start(game_id, game)
+        game['updatedAt'] = 1.0
+    play(journal, games['A'], 0)
+    journal.flush()
+    journal.write_snapshot(journal.prepare_snapshot(games.items()))
+
+    # Records after the snapshot position are replayed on top of it
+    play(journal, games['A'], 1)
+    play(journal, games['B'], 6)
+    journal.flush()
+    journal.close()
+
+    restarted = Journal(directory)
+    recovered = restarted.recover()
+
+    for game_id, game in games.items():
+        assert recovered[game_id]['board'].to_dict() == game['board'].to_dict()
+        assert recovered[game_id]['seq'] == game['seq']
+    # New games get fresh indexes
+    new = new_game('C')
+    restarted.start('C', new)
+    assert new['journal'] == 2
+
+
+def test_snapshot_reuses_unchanged_games(directory):
+    journal = Journal(directory)
+    games = {'A': new_game('A'), 'B': new_game('B')}
+    for game_id, game in games.items():
+        journal.start(game_id, game)
+        game['updatedAt'] = 1.0
+    journal.write_snapshot(journal.prepare_snapshot(games.items()))
+
+    play(journal, games['B'], 2)
+    games['B']['updatedAt'] = 2.0
+    snapshot = journal.prepare_snapshot(games.items())
+    encoded = {game_id: game for game_id, _, game in snapshot['games']}
+
+    assert isinstance(encoded['A'], str)
+    assert encoded['B']['seq'] == 1
+    # The copy does not follow later changes to the live game
+    play(journal, games['B'], 2)
+    assert encoded['B']['seq'] == 1
+
+
+def test_torn_tail_is_truncated(directory):
+    journal = Journal(directory)
+    game = new_game()
+    journal.start('A', game)
+    play(journal, game, 3)
+    journal.flush()
+    journal.close()
+    size = os.path.getsize(segment_path(directory))
+    with open(segment_path(directory), 'ab') as f:
+        f.write(bytes([MOVE, 0]))  # a crash mid-record
+
+    restarted = Journal(directory)
+    recovered = restarted.recover()
+
+    assert recovered['A']['seq'] == 1
+    assert os.path.getsize(segment_path(directory)) == size
+    # New records follow the last complete one
+    play(restarted, recovered['A'], 4)
+    restarted.flush()
+    restarted.close()
+    assert Journal(directory).recover()['A']['seq'] == 2
+
+
+def test_evict_ends_the_game_and_its_replay(directory):
+    journal = Journal(directory)
+    game = new_game()
+    journal.start('A', game)
+    play(journal, game, 3)
+    journal.timeout(game, 2)
+    journal.evict('A')
+    journal.evict('A')  # once only
+    journal.flush()
+    journal.close()
+
+    with open(segment_path(directory), 'rb') as f:
+        data = f.read()
+    assert data.count(bytes([EVICT])) >= 1
+    restarted = Journal(directory)
+    assert restarted.recover() == {}
+    assert list(restarted.replay('A')) == [
+        {'type': 'start', 'players': {'1': {'name': 'One'}}},
+        {'type': 'move', 'col': 3},
+        {'type': 'timeout', 'loser': 2},
+    ]
+
+
+def test_replay_skips_other_games_and_spans_segments(directory):
+    journal = Journal(directory, segment_bytes=64)
+    first, second = new_game('A'), new_game('B')
+    journal.start('A', first)
+    journal.start('B', second)
+    for col in (0, 1, 2, 3):
+        play(journal, first, col)
+        play(journal, second, 6)
+    journal.reset(first, switch_sides=True)
+    journal.flush()
+
+    assert len([name for name in os.listdir(directory) if name.startswith('journal-')]) > 1
+    events = list(journal.replay('A'))
+    assert [event['col'] for event in events if event['type'] == 'move'] == [0, 1, 2, 3]
+    assert events[-1] == {'type': 'reset', 'switchSides': True}
+    assert journal.replay('missing') is None
+
+
+def test_only_recent_finished_games_stay_replayable(directory):
+    journal = Journal(directory, retain_games=2)
+    live = new_game('L')
+    journal.start('L', live)
+    live['updatedAt'] = 1.0
+    for number in range(4):
+        game = new_game(f'F{number}')
+        journal.start(f'F{number}', game)
+        play(journal, game, number)
+        journal.evict(f'F{number}')
+    journal.flush()
+
+    assert set(journal.games) == {'L', 'F2', 'F3'}
+    assert journal.replay('F1') is None
+
+    journal.write_snapshot(journal.prepare_snapshot([('L', live)]))
+    restarted = Journal(directory, retain_games=2)
+    restarted.recover()
+    assert set(restarted.games) == {'L', 'F2', 'F3'}
+    assert [event['type'] for event in restarted.replay('F3')] == ['start', 'move']
@@ -0,0 +1,112 @@
+import time
+
+import fakeredis
+import pytest
+
+from engine import Board
+from store import MemoryStore, RedisStore
+
+
+def new_game(name='A'):
+    return {
+        'board': Board(),
+        'seq': 0,
+        'players': {1: {'id': name.lower(), 'name': name, 'sid': None, 'away': None}},
+    }
+
+
+@pytest.fixture(params=['memory', 'redis'])
+def make_store(request):
+    def make(max_games=None):
+        if request.param == 'memory':
+            return MemoryStore(max_games=max_games)
+        return RedisStore(fakeredis.FakeRedis(), max_games=max_games)
+    return make
+
+
+def test_put_and_get(make_store):
+    store = make_store()
+    game = new_game()
+    game['board'].play(3)
+    assert store.put('G1', game) == []
+
+    loaded = store.get('G1')
+    assert loaded['board'].to_list() == game['board'].to_list()
+    assert loaded['players'][1]['name'] == 'A'
+    assert loaded['rev'] == 0
+    assert 'G1' in store and len(store) == 1
+    assert store.get('missing') is None
+
+
+def test_put_without_replace_keeps_existing_game(make_store):
+    store = make_store(max_games=1)
+    first, second = new_game('A'), new_game('B')
+    assert store.put('G1', first, replace=False) == []
+
+    assert store.put('G1', second, replace=False) is None
+    assert store.get('G1')['players'][1]['name'] == 'A'
+    assert store.evicted == 0
+    assert store.put('G1', second) == []
+    assert store.get('G1')['players'][1]['name'] == 'B'
+
+
+def test_save_rejects_stale_copy(make_store):
+    store = make_store()
+    store.put('G1', new_game())
+    stale = dict(store.get('G1'))
+
+    fresh = store.get('G1')
+    fresh['seq'] += 1
+    assert store.save('G1', fresh)
+    assert store.get('G1')['rev'] == 1
+
+    stale['seq'] += 5
+    assert not store.save('G1', stale)
+    assert store.get('G1')['seq'] == 1
+
+
+def test_save_missing_game_fails(make_store):
+    store = make_store()
+    game = new_game()
+    game['rev'] = 0
+    assert not store.save('G1', game)
+
+
+def test_evict_counts(make_store):
+    store = make_store()
+    store.put('G1', new_game())
+    store.evict('G1')
+    store.evict('G1')
+    assert 'G1' not in store
+    assert store.evicted == 1
+
+    store.put('G2', new_game())
+    store.delete('G2')
+    assert 'G2' not in store
+    assert store.evicted == 1
+
+
+def test_max_games_evicts_least_recently_used(make_store):
+    store = make_store(max_games=2)
+    store.put('G1', new_game())
+    store.put('G2', new_game())
+    store.get('G1')  # G2 is now the least recently used
+    assert store.put('G3', new_game()) == ['G2']
+
+    assert 'G2' not in store
+    assert 'G1' in store and 'G3' in store
+    assert store.evicted == 1
+    assert len(store) == 2
+
+
+def test_idle(make_store):
+    store = make_store()
+    store.put('G1', new_game())
+    store.put('G2', new_game())
+    later = time.time() + 1
+
+    assert sorted(store.idle(later)) == ['G1', 'G2']
+    assert store.idle(0) == []
+    # Reading without touching keeps a game idle
+    store.get('G1', touch=False)
+    assert 'G1' in store.idle(later)
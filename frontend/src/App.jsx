@@ -44,11 +44,24 @@ const ConnectFour = () => {
   const [gameState, setGameState] = useState(null); // Store game state for reconnection
   const [rematchRequested, setRematchRequested] = useState(false);
   const [rematchPending, setRematchPending] = useState(false);
+  const [searching, setSearching] = useState(false);
   const [swipeStart, setSwipeStart] = useState(null);
   const inputRef = useRef(null);
   const socketRef = useRef(null);
   const timerRef = useRef(null);
   const nameInputRef = useRef(null);
+  const seqRef = useRef(0); // Last server sequence number applied to the board
+  const boardRef = useRef(board);
+  const gameIdRef = useRef(gameId);
+  const stopPingRef = useRef(null); // Stops the running connection quality monitor
+
+  useEffect(() => {
+    boardRef.current = board;
+  }, [board]);
+
+  useEffect(() => {
+    gameIdRef.current = gameId;
+  }, [gameId]);
 
   useEffect(() => {
     localStorage.setItem('playerId', playerId);
@@ -63,7 +76,8 @@ const ConnectFour = () => {
     soundManager.enabled = soundsEnabled;
   }, [soundsEnabled]);
 
-  // Timer effect
+  // Timer effect: counts down the deadline from the last clock_update.
+  // The server enforces the clock and sends timeout_loss when it runs out.
   useEffect(() => {
     if (winner || !gameId || waitingForPlayer || !connected) {
       if (timerRef.current) {
@@ -74,7 +88,6 @@ const ConnectFour = () => {
     }
 
     if (playerNumber && playerNumber === currentPlayer) {
-      setTimeRemaining(moveTimer);
       timerRef.current = setInterval(() => {
         setTimeRemaining((prev) => {
           if (prev <= 1) {
@@ -82,7 +95,6 @@ const ConnectFour = () => {
               clearInterval(timerRef.current);
               timerRef.current = null;
             }
-            showMessage('Time\'s up! Your turn was skipped.');
             return 0;
           }
           return prev - 1;
@@ -187,8 +199,9 @@ const ConnectFour = () => {
           }
         }
         
-        // Monitor connection quality
-        monitorConnectionQuality(newSocket);
+        // Monitor connection quality; a reconnect replaces the old loop
+        if (stopPingRef.current) stopPingRef.current();
+        stopPingRef.current = monitorConnectionQuality(newSocket);
       });
 
       newSocket.on('disconnect', () => {
@@ -223,91 +236,161 @@ const ConnectFour = () => {
         console.log('Server confirmed:', data);
       });
 
+      // Apply a full snapshot from the server (join or resync)
+      const applySnapshot = (state) => {
+        seqRef.current = state.seq;
+        boardRef.current = state.board;
+        setBoard(state.board);
+        setCurrentPlayer(state.currentPlayer);
+        setWinner(state.winner);
+        setGameState(state);
+        const result = state.winner ? checkWinnerLocal(state.board) : null;
+        setWinningCells(result ? result.cells : []);
+      };
+
+      // Clear the board locally for a new game, reset or rematch
+      const applyReset = (seq) => {
+        const emptyBoard = Array(6).fill(null).map(() => Array(7).fill(null));
+        seqRef.current = seq;
+        boardRef.current = emptyBoard;
+        setBoard(emptyBoard);
+        setCurrentPlayer(1);
+        setWinner(null);
+        setWinningCells([]);
+        setLastMove(null);
+        setGameState({ board: emptyBoard, currentPlayer: 1, winner: null });
+      };
+
+      // Ask the server for a full snapshot after missing one or more moves
+      const requestSync = () => {
+        if (gameIdRef.current) {
+          newSocket.emit('sync_state', { gameId: gameIdRef.current, seq: seqRef.current });
+        }
+      };
+
+      newSocket.on('match_searching', (data) => {
+        console.log('🔎 Searching for a match:', data);
+        setSearching(true);
+      });
+
+      newSocket.on('match_cancelled', () => {
+        setSearching(false);
+      });
+
+      // The server paired us with an opponent and already seated us
+      newSocket.on('match_found', (data) => {
+        console.log('🤝 Match found:', data);
+        setSearching(false);
+        setGameId(data.gameId);
+        setPlayerNumber(data.playerNumber);
+        applySnapshot(data.gameState);
+        setPlayers(data.players);
+        setWaitingForPlayer(false);
+        soundManager.playJoin();
+      });
+
       newSocket.on('game_created', (data) => {
         console.log('🎮 Game created:', data);
-        if (data.gameState) {
-          setBoard(data.gameState.board);
-          setCurrentPlayer(data.gameState.currentPlayer);
-          setWinner(data.gameState.winner);
-        }
+        applyReset(data.seq);
         if (data.players) {
           setPlayers(data.players);
         }
-        setWaitingForPlayer(true);
-        setGameState(data.gameState);
+        // Games against the computer start with both seats filled
+        setWaitingForPlayer(!data.players?.[2]);
         soundManager.playJoin();
       });
 
       newSocket.on('game_joined', (data) => {
         console.log('🎮 Game joined:', data);
         if (data.gameState) {
-          setBoard(data.gameState.board);
-          setCurrentPlayer(data.gameState.currentPlayer);
-          setWinner(data.gameState.winner);
+          applySnapshot(data.gameState);
         }
         if (data.players) {
           setPlayers(data.players);
         }
-        setWaitingForPlayer(false);
-        setGameState(data.gameState);
+        // A rejoining Player 1 may still be waiting for an opponent
+        setWaitingForPlayer(!data.players?.[2]);
         soundManager.playJoin();
       });
 
+      newSocket.on('player_away', (data) => {
+        console.log('📴 Player away:', data);
+        showMessage(`Opponent disconnected. Waiting ${data.graceSeconds}s for them to return...`);
+      });
+
+      newSocket.on('player_returned', (data) => {
+        console.log('🔌 Player returned:', data);
+        showMessage('Opponent reconnected!');
+      });
+
+      newSocket.on('sync_state', (data) => {
+        console.log('🔁 State resynced:', data);
+        applySnapshot(data);
+        if (data.players) {
+          setPlayers(data.players);
+        }
+      });
+
       newSocket.on('player_joined', (data) => {
         console.log('👤 Another player joined:', data);
         const player2Name = data.playerName || data.players?.[2]?.name || 'Player 2';
         showMessage(`${player2Name} joined the game!`);
-        // Update game state when player 2 joins to ensure synchronization
-        if (data.gameState) {
-          setBoard(data.gameState.board);
-          setCurrentPlayer(data.gameState.currentPlayer);
-          setWinner(data.gameState.winner);
+        // Resync only if we have missed state changes
+        if (data.seq !== seqRef.current) {
+          requestSync();
         }
         if (data.players) {
           setPlayers(data.players);
         }
         setWaitingForPlayer(false);
-        setGameState(data.gameState);
         soundManager.playJoin();
       });
 
       newSocket.on('move_made', (data) => {
         console.log('🎯 Move made:', data);
-        
-        if (data.lastMove) {
-          // Animate piece drop
-          const cellKey = `${data.lastMove.row}-${data.lastMove.col}`;
-          setAnimatingCells(prev => new Set(prev).add(cellKey));
-          setTimeout(() => {
-            setAnimatingCells(prev => {
-              const newSet = new Set(prev);
-              newSet.delete(cellKey);
-              return newSet;
-            });
-          }, 600);
-          
-          setLastMove([data.lastMove.row, data.lastMove.col]);
-          setTimeout(() => setLastMove(null), 1000);
-        }
 
-        setBoard(data.board);
-        setCurrentPlayer(data.currentPlayer);
-        setWinner(data.winner);
-        
-        if (data.players) {
-          setPlayers(data.players);
+        // Moves arrive as deltas; ignore stale ones and resync on a gap
+        if (data.seq <= seqRef.current) {
+          return;
         }
+        if (data.seq !== seqRef.current + 1) {
+          requestSync();
+          return;
+        }
+        seqRef.current = data.seq;
+
+        // Animate piece drop
+        const cellKey = `${data.row}-${data.col}`;
+        setAnimatingCells(prev => new Set(prev).add(cellKey));
+        setTimeout(() => {
+          setAnimatingCells(prev => {
+            const newSet = new Set(prev);
+            newSet.delete(cellKey);
+            return newSet;
+          });
+        }, 600);
+
+        setLastMove([data.row, data.col]);
+        setTimeout(() => setLastMove(null), 1000);
+
+        const nextBoard = boardRef.current.map(row => [...row]);
+        nextBoard[data.row][data.col] = data.player;
+        const nextPlayer = data.winner ? data.player : (data.player === 1 ? 2 : 1);
+        boardRef.current = nextBoard;
+
+        setBoard(nextBoard);
+        setCurrentPlayer(nextPlayer);
+        setWinner(data.winner);
 
         // Store game state for reconnection
         setGameState({
-          board: data.board,
-          currentPlayer: data.currentPlayer,
-          winner: data.winner,
-          players: data.players
+          board: nextBoard,
+          currentPlayer: nextPlayer,
+          winner: data.winner
         });
 
         if (data.winner) {
-          const result = checkWinnerLocal(data.board);
+          const result = checkWinnerLocal(nextBoard);
           if (result) {
             setWinningCells(result.cells);
           }
@@ -317,21 +400,31 @@ const ConnectFour = () => {
         }
       });
 
+      newSocket.on('clock_update', (data) => {
+        if (data.seq < seqRef.current) {
+          return;
+        }
+        setMoveTimer(data.moveLimit);
+        setTimeRemaining(Math.max(0, Math.ceil(data.moveSeconds)));
+      });
+
+      newSocket.on('timeout_loss', (data) => {
+        console.log('⏰ Timeout:', data);
+        if (data.seq !== seqRef.current + 1) {
+          requestSync();
+          return;
+        }
+        seqRef.current = data.seq;
+        setWinner(data.winner);
+        showMessage(data.reason === 'game' ? 'Game clock ran out!' : 'Move timer ran out!');
+        soundManager.playError();
+      });
+
       newSocket.on('game_reset', (data) => {
         console.log('🔄 Game reset:', data);
-        setBoard(data.board);
-        setCurrentPlayer(data.currentPlayer);
-        setWinner(data.winner);
-        setWinningCells([]);
-        setLastMove(null);
+        applyReset(data.seq);
         setRematchPending(false);
         setRematchRequested(false);
-        // Store game state for reconnection
-        setGameState({
-          board: data.board,
-          currentPlayer: data.currentPlayer,
-          winner: data.winner
-        });
       });
 
       newSocket.on('error', (data) => {
@@ -353,16 +446,10 @@ const ConnectFour = () => {
         if (data.switchSides) {
           setPlayerNumber(playerNumber === 1 ? 2 : 1);
         }
-        if (data.gameState) {
-          setBoard(data.gameState.board);
-          setCurrentPlayer(data.gameState.currentPlayer);
-          setWinner(data.gameState.winner);
-        }
+        applyReset(data.seq);
         if (data.players) {
           setPlayers(data.players);
         }
-        setWinningCells([]);
-        setLastMove(null);
         showMessage('Rematch started!');
       });
 
@@ -503,7 +590,7 @@ const ConnectFour = () => {
     setErrorMsg('');
   };
 
-  const createGame = () => {
+  const createGame = (difficulty = null) => {
     if (!connected) {
       showMessage("Not connected to server!");
       return;
@@ -517,7 +604,9 @@ const ConnectFour = () => {
     socket.emit('create_game', {
       gameId: newGameId,
       playerId: playerId,
-      playerName: playerName
+      playerName: playerName,
+      vsComputer: difficulty !== null,
+      difficulty: difficulty
     });
     
     // Reset local state, but server will send the actual state
@@ -526,7 +615,24 @@ const ConnectFour = () => {
     setWinner(null);
     setWinningCells([]);
     setLastMove(null);
-    setWaitingForPlayer(true);
+    setWaitingForPlayer(difficulty === null);
+  };
+
+  const findMatch = () => {
+    if (!connected) {
+      showMessage("Not connected to server!");
+      return;
+    }
+
+    if (searching) {
+      socket.emit('cancel_match', {});
+      return;
+    }
+
+    socket.emit('find_match', {
+      playerId: playerId,
+      playerName: playerName
+    });
   };
 
   const joinGame = (id) => {
@@ -699,7 +805,7 @@ const ConnectFour = () => {
 
             <div className="space-y-4">
               <button
-                onClick={createGame}
+                onClick={() => createGame()}
                 disabled={!connected}
                 className="w-full bg-gradient-to-r from-blue-500 to-purple-600 hover:from-blue-600 hover:to-purple-700 text-white py-4 rounded-xl font-semibold transition-all duration-300 transform hover:scale-105 shadow-lg hover:shadow-xl disabled:opacity-50 disabled:cursor-not-allowed disabled:transform-none"
               >
@@ -709,6 +815,41 @@ const ConnectFour = () => {
                 </div>
               </button>
 
+              <button
+                onClick={findMatch}
+                disabled={!connected}
+                className="w-full bg-white/10 hover:bg-white/20 text-white py-3 rounded-xl font-semibold transition-all duration-300 border border-white/20 disabled:opacity-50 disabled:cursor-not-allowed"
+              >
+                <div className="flex items-center justify-center gap-2">
+                  {searching ? (
+                    <>
+                      <div className="animate-spin rounded-full h-4 w-4 border-2 border-white border-t-transparent"></div>
+                      Searching... (click to cancel)
+                    </>
+                  ) : (
+                    <>
+                      <Sparkles className="w-5 h-5" />
+                      Find Match
+                    </>
+                  )}
+                </div>
+              </button>
+
+              <div className="flex items-center gap-2">
+                <Gamepad2 className="w-5 h-5 text-blue-200" />
+                <span className="text-sm text-blue-200 whitespace-nowrap">vs Computer:</span>
+                {['easy', 'medium', 'hard'].map((level) => (
+                  <button
+                    key={level}
+                    onClick={() => createGame(level)}
+                    disabled={!connected}
+                    className="flex-1 bg-white/10 hover:bg-white/20 text-white py-2 rounded-xl text-sm font-semibold capitalize transition-all duration-300 border border-white/20 disabled:opacity-50 disabled:cursor-not-allowed"
+                  >
+                    {level}
+                  </button>
+                ))}
+              </div>
+
               <div className="relative">
                 <div className="absolute inset-0 flex items-center">
                   <div className="w-full border-t border-white/20"></div>